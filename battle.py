@@ -0,0 +1,347 @@
+import argparse
+import random
+import re
+import time
+from collections import Counter
+from config import (
+    MENTAL_ATTACKS, PHYSICAL_ATTACKS, SOCIAL_ATTACKS,
+    BATTLE_MAX_ROUNDS, BATTLE_HP_PER_RESOLVE, BATTLE_DAMAGE_VARIANCE,
+    BATTLE_INITIATIVE_VARIANCE, BATTLE_SUPPORT_SLOTS
+)
+from storage import derive_card_stats, STAT_FIELDS, MAX_STAR
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Bump when the rules change so stored battles can be told apart
+BATTLE_VERSION = 1
+
+# Stat each move type attacks with; battle logs store moves by index into this
+MOVE_STATS = ("Mental", "Physical", "Social")
+MOVE_TYPES = {
+    "Mental": MENTAL_ATTACKS,
+    "Physical": PHYSICAL_ATTACKS,
+    "Social": SOCIAL_ATTACKS
+}
+
+# Support bonuses read like "+20% Mental to Class D allies"; below
+# FULL_SUPPORT_STAR they give REDUCED_SUPPORT_BONUS percent, as shown on the card
+SUPPORT_BONUS_PATTERN = re.compile(r"^\s*([+-]?\d+(?:\.\d+)?)%\s+(\w+)(?:\s+to\s+(.*?))?\s*$", re.IGNORECASE)
+FULL_SUPPORT_STAR = 4
+REDUCED_SUPPORT_BONUS = 16.0
+
+def parse_support_bonus(text: str, star: int):
+    """``(fraction, stat, target tag or None for everyone)``, or None if ``text`` isn't a bonus"""
+    match = SUPPORT_BONUS_PATTERN.match(text or "")
+    if not match:
+        return None
+    percent, stat, target = match.groups()
+    stat = stat.capitalize()
+    if stat not in STAT_FIELDS:
+        return None
+    if star < FULL_SUPPORT_STAR and len(text.split()) >= 4:
+        percent = REDUCED_SUPPORT_BONUS
+    target = re.sub(r"\s*\ballies?$", "", (target or "").strip(), flags=re.IGNORECASE).strip()
+    return float(percent) / 100, stat, target.lower() if target and target.lower() != "all" else None
+
+def card_move_stats(character_data: dict) -> tuple:
+    """The stats a card can attack with, from its listed moves (every stat if none match)"""
+    moves = {move.strip().lower() for move in character_data.get("character_moves", "").split(",")}
+    stats = tuple(
+        stat for stat in MOVE_STATS
+        if any(move.lower() in moves for move in MOVE_TYPES[stat])
+    )
+    return stats or MOVE_STATS
+
+def build_fighter(character_data: dict, entry: dict = None, supports: list = ()) -> dict:
+    """A lead card at the entry's star level, boosted by up to BATTLE_SUPPORT_SLOTS ``(card, entry)`` supports"""
+    stats = derive_card_stats(character_data, entry)
+    tags = {tag.strip().lower() for tag in str(stats.get("Tags", "")).split(",") if tag.strip()}
+
+    # Bonuses from several supports add up before they are applied
+    boosts = Counter()
+    for support_card, support_entry in list(supports)[:BATTLE_SUPPORT_SLOTS]:
+        support_stats = derive_card_stats(support_card, support_entry)
+        bonus = parse_support_bonus(support_stats["Support_Bonus"], support_stats["Star"])
+        if bonus is None:
+            continue
+        fraction, stat, target = bonus
+        if target is None or target in tags:
+            boosts[stat] += fraction
+
+    fighter = {stat: stats[stat] * (1 + boosts[stat]) for stat in STAT_FIELDS}
+    fighter["name"] = character_data["character_name"]
+    fighter["moves"] = card_move_stats(character_data)
+    return fighter
+
+def choose_move(attacker: dict, defender: dict) -> str:
+    """The attacker's move stat with the best ratio against the defender's same stat"""
+    return max(attacker["moves"], key=lambda stat: attacker[stat] / max(defender[stat], 1))
+
+def base_damage(attack: float, defense: float) -> float:
+    """Damage before the roll: the attack stat, scaled down by how much of it the defense absorbs"""
+    return attack * attack / max(attack + defense, 1)
+
+def resolve_battle(a: dict, b: dict, rng: random.Random = None) -> dict:
+    """Fight two fighters from ``build_fighter``.
+
+    Each round both sides roll initiative; the higher roll strikes first
+    and the other strikes back if still standing. Returns the winner (0
+    for ``a``, 1 for ``b``, -1 for a draw), the rounds fought, the hit
+    points left and the turns as ``[side, move index, damage]``.
+    """
+    rng = rng or random.Random()
+    fighters = (a, b)
+    moves = [choose_move(a, b), choose_move(b, a)]
+    damage = [
+        base_damage(a[moves[0]], b[moves[0]]),
+        base_damage(b[moves[1]], a[moves[1]])
+    ]
+    max_hp = [a["Resolve"] * BATTLE_HP_PER_RESOLVE, b["Resolve"] * BATTLE_HP_PER_RESOLVE]
+    hp = list(max_hp)
+    turns = []
+    rounds = 0
+
+    while rounds < BATTLE_MAX_ROUNDS and hp[0] > 0 and hp[1] > 0:
+        rounds += 1
+        initiative = [
+            fighter["Initiative"] * rng.uniform(1 - BATTLE_INITIATIVE_VARIANCE, 1 + BATTLE_INITIATIVE_VARIANCE)
+            for fighter in fighters
+        ]
+        rolls = [
+            damage[side] * rng.uniform(1 - BATTLE_DAMAGE_VARIANCE, 1 + BATTLE_DAMAGE_VARIANCE)
+            for side in (0, 1)
+        ]
+        first = 0 if initiative[0] >= initiative[1] else 1
+        for side in (first, 1 - first):
+            if hp[side] <= 0:
+                break
+            hp[1 - side] -= rolls[side]
+            turns.append([side, MOVE_STATS.index(moves[side]), round(rolls[side])])
+
+    return {
+        "winner": _winner(hp[0], hp[1], max_hp[0], max_hp[1]),
+        "rounds": rounds,
+        "hp": [max(0, round(value)) for value in hp],
+        "turns": turns
+    }
+
+def _winner(hp_a, hp_b, max_a, max_b):
+    if hp_a <= 0 and hp_b <= 0:
+        return -1
+    if hp_b <= 0:
+        return 0
+    if hp_a <= 0:
+        return 1
+    # Undecided after the last round: the side with more of its health left wins
+    share_a, share_b = hp_a / max_a, hp_b / max_b
+    return 0 if share_a > share_b else 1 if share_b > share_a else -1
+
+class FighterTable:
+    """Fighters as NumPy arrays, for simulating many matchups at once"""
+    def __init__(self, fighters: list):
+        self.fighters = list(fighters)
+        self.stats = np.array([[fighter[stat] for stat in STAT_FIELDS] for fighter in self.fighters], dtype=np.float64)
+        self.moves = np.array([[stat in fighter["moves"] for stat in MOVE_STATS] for fighter in self.fighters], dtype=bool)
+
+    def __len__(self):
+        return len(self.fighters)
+
+    def column(self, stat: str):
+        return self.stats[:, STAT_FIELDS.index(stat)]
+
+def _batch_damage(table: FighterTable, attackers, defenders):
+    """Per-matchup base damage of the attackers, each using its best move"""
+    move_columns = [STAT_FIELDS.index(stat) for stat in MOVE_STATS]
+    attack = table.stats[attackers][:, move_columns]
+    defense = table.stats[defenders][:, move_columns]
+    ratio = np.where(table.moves[attackers], attack / np.maximum(defense, 1), -np.inf)
+    best = np.argmax(ratio, axis=1)
+    rows = np.arange(len(attackers))
+    attack, defense = attack[rows, best], defense[rows, best]
+    return attack * attack / np.maximum(attack + defense, 1)
+
+def simulate_battles(table: FighterTable, a_indices, b_indices, seed=None):
+    """Fight ``table`` fighters ``a_indices[i]`` against ``b_indices[i]`` for every i.
+
+    Follows the same rules as resolve_battle, one round at a time across
+    every matchup. Returns ``(winners, rounds)`` arrays.
+    """
+    rng = np.random.default_rng(seed)
+    a_indices = np.asarray(a_indices)
+    b_indices = np.asarray(b_indices)
+    n = len(a_indices)
+
+    damage_a = _batch_damage(table, a_indices, b_indices)
+    damage_b = _batch_damage(table, b_indices, a_indices)
+    initiative_a = table.column("Initiative")[a_indices]
+    initiative_b = table.column("Initiative")[b_indices]
+    max_a = table.column("Resolve")[a_indices] * BATTLE_HP_PER_RESOLVE
+    max_b = table.column("Resolve")[b_indices] * BATTLE_HP_PER_RESOLVE
+    hp_a, hp_b = max_a.copy(), max_b.copy()
+    rounds = np.zeros(n, dtype=np.int32)
+
+    low_i, high_i = 1 - BATTLE_INITIATIVE_VARIANCE, 1 + BATTLE_INITIATIVE_VARIANCE
+    low_d, high_d = 1 - BATTLE_DAMAGE_VARIANCE, 1 + BATTLE_DAMAGE_VARIANCE
+    for _ in range(BATTLE_MAX_ROUNDS):
+        active = (hp_a > 0) & (hp_b > 0)
+        if not active.any():
+            break
+        rounds += active
+        a_first = initiative_a * rng.uniform(low_i, high_i, n) >= initiative_b * rng.uniform(low_i, high_i, n)
+        roll_a = damage_a * rng.uniform(low_d, high_d, n)
+        roll_b = damage_b * rng.uniform(low_d, high_d, n)
+
+        hp_b -= np.where(active & a_first, roll_a, 0)
+        hp_a -= np.where(active & ~a_first, roll_b, 0)
+        standing = (hp_a > 0) & (hp_b > 0)
+        hp_a -= np.where(active & a_first & standing, roll_b, 0)
+        hp_b -= np.where(active & ~a_first & standing, roll_a, 0)
+
+    # Fighters without Resolve start at 0 HP and lose outright; keep them out of the division
+    share_a = hp_a / np.where(max_a > 0, max_a, 1)
+    share_b = hp_b / np.where(max_b > 0, max_b, 1)
+    winners = np.where(
+        (hp_a <= 0) & (hp_b <= 0), -1,
+        np.where(hp_b <= 0, 0,
+        np.where(hp_a <= 0, 1, np.where(share_a > share_b, 0, np.where(share_b > share_a, 1, -1))))
+    ).astype(np.int8)
+    return winners, rounds
+
+def battle_record(players: list, teams: list, result: dict) -> dict:
+    """Compact log of a battle for Storage.record_battle.
+
+    ``teams`` holds each side's ``(card, entry)`` pairs, lead first; cards
+    are stored as ``[card id, star]``.
+    """
+    return {
+        "version": BATTLE_VERSION,
+        "players": list(players),
+        "teams": [
+            [[card.get("_id"), (entry or {}).get("Star", card.get("character_star", 1))] for card, entry in team]
+            for team in teams
+        ],
+        "winner": result["winner"],
+        "rounds": result["rounds"],
+        "hp": result["hp"],
+        "turns": result["turns"]
+    }
+
+def run_battle(storage, players: list, teams: list, rng: random.Random = None) -> dict:
+    """Fight two teams of ``(card, entry)`` pairs, lead first, and store the battle log.
+
+    Returns the resolve_battle result; the log is written with
+    ``storage.record_battle``, which logs and swallows storage errors.
+    """
+    fighters = [build_fighter(*team[0], supports=team[1:]) for team in teams]
+    result = resolve_battle(fighters[0], fighters[1], rng)
+    storage.record_battle(battle_record(players, teams, result))
+    return result
+
+def _balance_fighters(cards: list) -> list:
+    """Every card at every star level from its base star up, without supports"""
+    fighters = []
+    for card in cards:
+        for star in range(card.get("character_star", 1), MAX_STAR + 1):
+            fighter = build_fighter(card, {"id": card.get("_id"), "Star": star})
+            fighter["star"] = star
+            fighters.append(fighter)
+    return fighters
+
+def record_sample_battles(cards: list, count: int, seed=None):
+    """Play ``count`` battles between random teams and store their logs, as a sample to inspect"""
+    from database import create_database
+    database = create_database()
+    rng = random.Random(seed)
+    try:
+        for _ in range(count):
+            teams = [
+                [(card, {"id": card.get("_id"), "Star": rng.randint(card.get("character_star", 1), MAX_STAR)})
+                 for card in rng.sample(cards, min(len(cards), 1 + BATTLE_SUPPORT_SLOTS))]
+                for _ in range(2)
+            ]
+            # Simulated battles have no players
+            run_battle(database, [None, None], teams, rng)
+    finally:
+        database.close()
+    print(f"Recorded {count:,} battle logs")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate random battles between every card and star level for balance tuning")
+    parser.add_argument("--battles", type=int, default=500_000, help="number of battles to simulate")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a reproducible run")
+    parser.add_argument("--snapshot", help="read cards from a catalog snapshot instead of the database")
+    parser.add_argument("--top", type=int, default=5, help="strongest and weakest cards to list")
+    parser.add_argument("--record", type=int, default=0, metavar="N",
+                        help="also play N random team battles and store their logs in the database")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        from catalog import catalog
+        catalog.load_snapshot(args.snapshot)
+        cards = list(catalog.by_name.values())
+    else:
+        from database import create_database
+        database = create_database()
+        try:
+            database.warm_up()
+            cards = list(database.catalog.by_name.values())
+        finally:
+            database.close()
+    if not cards:
+        print("No cards to simulate")
+        return
+
+    if args.record:
+        record_sample_battles(cards, args.record, args.seed)
+
+    fighters = _balance_fighters(cards)
+    start = time.perf_counter()
+    if np is not None:
+        rng = np.random.default_rng(args.seed)
+        a_indices = rng.integers(0, len(fighters), args.battles)
+        b_indices = rng.integers(0, len(fighters), args.battles)
+        winners, _ = simulate_battles(FighterTable(fighters), a_indices, b_indices, rng.integers(1 << 63))
+        a_indices, b_indices, winners = a_indices.tolist(), b_indices.tolist(), winners.tolist()
+    else:
+        rng = random.Random(args.seed)
+        a_indices = [rng.randrange(len(fighters)) for _ in range(args.battles)]
+        b_indices = [rng.randrange(len(fighters)) for _ in range(args.battles)]
+        winners = [resolve_battle(fighters[a], fighters[b], rng)["winner"] for a, b in zip(a_indices, b_indices)]
+    elapsed = time.perf_counter() - start
+
+    # A draw counts as half a win for each side
+    star_wins, star_games = Counter(), Counter()
+    card_wins, card_games = Counter(), Counter()
+    for a, b, winner in zip(a_indices, b_indices, winners):
+        score = 1.0 if winner == 0 else 0.0 if winner == 1 else 0.5
+        star_pair = (fighters[a]["star"], fighters[b]["star"])
+        star_wins[star_pair] += score
+        star_games[star_pair] += 1
+        star_wins[star_pair[::-1]] += 1 - score
+        star_games[star_pair[::-1]] += 1
+        for index, points in ((a, score), (b, 1 - score)):
+            card_wins[fighters[index]["name"]] += points
+            card_games[fighters[index]["name"]] += 1
+
+    print(f"{args.battles:,} battles in {elapsed:.2f}s ({args.battles / elapsed:,.0f} battles/sec)")
+    stars = sorted({fighter["star"] for fighter in fighters})
+    print("Win rate by star (row vs column):")
+    print(f"{'':>6}" + "".join(f"{f'{star}★':>8}" for star in stars))
+    for row in stars:
+        cells = "".join(
+            f"{star_wins[(row, column)] / star_games[(row, column)]:>8.1%}" if star_games[(row, column)] else f"{'-':>8}"
+            for column in stars
+        )
+        print(f"{f'{row}★':>6}{cells}")
+
+    ranked = sorted(card_games, key=lambda name: card_wins[name] / card_games[name], reverse=True)
+    print(f"{'Card':<24}{'Win rate':>10}{'Battles':>10}")
+    shown = ranked if len(ranked) <= args.top * 2 else ranked[:args.top] + ranked[-args.top:]
+    for name in shown:
+        print(f"{name:<24}{card_wins[name] / card_games[name]:>10.1%}{card_games[name]:>10,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Minimal stand-ins for the Discord context and interaction objects the commands use"""
+import itertools
+
+_ids = itertools.count(1000)
+
+class StubUser:
+    def __init__(self, user_id: int, name: str = "bench-user"):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.avatar = None
+
+class StubMessage:
+    def __init__(self, **fields):
+        self.id = next(_ids)
+        self.fields = fields
+
+    async def edit(self, **fields):
+        self.fields.update(fields)
+        return self
+
+class StubContext:
+    """Stands in for commands.Context; records what the command sent"""
+    def __init__(self, author: StubUser):
+        self.author = author
+        self.command = None
+        self.sent = []
+
+    async def send(self, content=None, **fields):
+        message = StubMessage(content=content, **fields)
+        self.sent.append(message)
+        return message
+
+class StubResponse:
+    def __init__(self):
+        self.deferred = False
+
+    async def defer(self, **kwargs):
+        self.deferred = True
+
+    async def send_message(self, content=None, **fields):
+        return StubMessage(content=content, **fields)
+
+    async def edit_message(self, **fields):
+        return StubMessage(**fields)
+
+class StubInteraction:
+    """Stands in for discord.Interaction on a message with components"""
+    def __init__(self, user: StubUser, message: StubMessage = None):
+        self.id = next(_ids)
+        self.token = f"token-{self.id}"
+        self.user = user
+        self.message = message or StubMessage()
+        self.response = StubResponse()
+        self.edits = 0
+
+    async def edit_original_response(self, **fields):
+        self.edits += 1
+        return await self.message.edit(**fields)
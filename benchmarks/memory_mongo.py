@@ -0,0 +1,325 @@
+"""In-memory stand-in for the parts of pymongo the bot uses.
+
+Good enough to run the bot's database code without a server: filters with
+equality, dotted paths and the comparison operators the code uses, and
+updates with $set/$unset/$inc/$min/$max/$push/$setOnInsert. Aggregation
+pipelines are not supported. An optional per-call latency simulates the
+network round trip to a real cluster.
+"""
+import copy
+import itertools
+import re
+import time
+from pymongo import ReturnDocument
+
+_MISSING = object()
+
+def _get(doc, path):
+    current = doc
+    for part in path.split("."):
+        if isinstance(current, dict) and part in current:
+            current = current[part]
+        else:
+            return _MISSING
+    return current
+
+def _set(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+def _unset(doc, path):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+def _matches_condition(value, condition) -> bool:
+    if not (isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition)):
+        return value is not _MISSING and value == condition
+
+    for operator, argument in condition.items():
+        if operator == "$exists":
+            if (value is not _MISSING) != bool(argument):
+                return False
+        elif operator == "$ne":
+            if value is not _MISSING and value == argument:
+                return False
+        elif operator == "$options":
+            continue
+        elif value is _MISSING:
+            return False
+        elif operator == "$eq" and not value == argument:
+            return False
+        elif operator == "$gt" and not value > argument:
+            return False
+        elif operator == "$gte" and not value >= argument:
+            return False
+        elif operator == "$lt" and not value < argument:
+            return False
+        elif operator == "$lte" and not value <= argument:
+            return False
+        elif operator == "$in" and value not in argument:
+            return False
+        elif operator == "$nin" and value in argument:
+            return False
+        elif operator == "$regex":
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            if not re.search(argument, str(value), flags):
+                return False
+        elif operator not in ("$eq", "$gt", "$gte", "$lt", "$lte", "$in", "$nin", "$regex"):
+            raise NotImplementedError(f"Query operator {operator} is not supported")
+    return True
+
+def matches(doc, query) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif not _matches_condition(_get(doc, key), condition):
+            return False
+    return True
+
+def _project(doc, projection):
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    included = [key for key, keep in projection.items() if keep]
+    if included:
+        projected = {"_id": doc["_id"]} if projection.get("_id", 1) and "_id" in doc else {}
+        for path in included:
+            value = _get(doc, path)
+            if value is not _MISSING:
+                _set(projected, path, value)
+        return projected
+    return {key: value for key, value in doc.items() if key not in projection}
+
+def apply_update(doc, update, inserting: bool = False):
+    if isinstance(update, list):
+        raise NotImplementedError("Update pipelines are not supported")
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            current = _get(doc, path)
+            if operator == "$set":
+                _set(doc, path, copy.deepcopy(value))
+            elif operator == "$setOnInsert":
+                if inserting:
+                    _set(doc, path, copy.deepcopy(value))
+            elif operator == "$unset":
+                _unset(doc, path)
+            elif operator == "$inc":
+                _set(doc, path, (0 if current is _MISSING else current) + value)
+            elif operator == "$min":
+                _set(doc, path, value if current is _MISSING else min(current, value))
+            elif operator == "$max":
+                _set(doc, path, value if current is _MISSING else max(current, value))
+            elif operator == "$push":
+                _set(doc, path, ([] if current is _MISSING else current) + [copy.deepcopy(value)])
+            else:
+                raise NotImplementedError(f"Update operator {operator} is not supported")
+
+class DuplicateKeyError(Exception):
+    pass
+
+class Result:
+    def __init__(self, matched_count=0, modified_count=0, upserted_id=None, inserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+class Cursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, key, direction=1):
+        if isinstance(key, list):
+            key, direction = key[0]
+        def sort_key(doc):
+            value = _get(doc, key)
+            return (value is _MISSING, value if value is not _MISSING else 0)
+        self._docs.sort(key=sort_key, reverse=direction == -1)
+        return self
+
+    def limit(self, count):
+        if count:
+            self._docs = self._docs[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self._docs)
+
+class MemoryCollection:
+    def __init__(self, client, name):
+        self._client = client
+        self.name = name
+        self.docs = {}
+        self.indexes = {}
+        self._ids = itertools.count(1)
+
+    def _round_trip(self):
+        self._client.round_trips += 1
+        if self._client.latency:
+            time.sleep(self._client.latency)
+
+    def _matching(self, query):
+        if query and set(query) == {"_id"} and not isinstance(query["_id"], dict):
+            doc = self.docs.get(query["_id"])
+            return [doc] if doc is not None else []
+        return [doc for doc in self.docs.values() if matches(doc, query)]
+
+    def _upsert(self, query, update):
+        doc = {key: copy.deepcopy(value) for key, value in query.items()
+               if not key.startswith("$") and "." not in key and not isinstance(value, dict)}
+        apply_update(doc, update, inserting=True)
+        doc.setdefault("_id", next(self._ids))
+        self.docs[doc["_id"]] = doc
+        return doc
+
+    def find(self, query=None, projection=None, **kwargs):
+        self._round_trip()
+        return Cursor([_project(doc, projection) for doc in self._matching(query)])
+
+    def find_one(self, query=None, projection=None, **kwargs):
+        self._round_trip()
+        found = self._matching(query)
+        return _project(found[0], projection) if found else None
+
+    def count_documents(self, query, limit=0, **kwargs):
+        self._round_trip()
+        count = len(self._matching(query))
+        return min(count, limit) if limit else count
+
+    def insert_one(self, doc):
+        self._round_trip()
+        doc.setdefault("_id", next(self._ids))
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError(f"Duplicate _id {doc['_id']!r}")
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+        return Result(inserted_id=doc["_id"])
+
+    def _update(self, query, update, upsert, many):
+        found = self._matching(query)
+        if not many:
+            found = found[:1]
+        for doc in found:
+            apply_update(doc, update)
+        if not found and upsert:
+            doc = self._upsert(query, update)
+            return Result(upserted_id=doc["_id"])
+        return Result(len(found), len(found))
+
+    def update_one(self, query, update, upsert=False, **kwargs):
+        self._round_trip()
+        return self._update(query, update, upsert, many=False)
+
+    def update_many(self, query, update, upsert=False, **kwargs):
+        self._round_trip()
+        return self._update(query, update, upsert, many=True)
+
+    def replace_one(self, query, replacement, upsert=False, **kwargs):
+        self._round_trip()
+        return self._replace(query, replacement, upsert)
+
+    def _replace(self, query, replacement, upsert):
+        found = self._matching(query)
+        if found:
+            replacement = copy.deepcopy(replacement)
+            replacement.setdefault("_id", found[0]["_id"])
+            self.docs[found[0]["_id"]] = replacement
+            return Result(1, 1)
+        if upsert:
+            replacement = copy.deepcopy(replacement)
+            replacement.setdefault("_id", query.get("_id", next(self._ids)))
+            self.docs[replacement["_id"]] = replacement
+            return Result(upserted_id=replacement["_id"])
+        return Result()
+
+    def find_one_and_update(self, query, update, projection=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE, **kwargs):
+        self._round_trip()
+        found = self._matching(query)
+        if found:
+            before = copy.deepcopy(found[0])
+            apply_update(found[0], update)
+            return _project(found[0] if return_document else before, projection)
+        if upsert:
+            doc = self._upsert(query, update)
+            return _project(doc, projection) if return_document else None
+        return None
+
+    def delete_one(self, query, **kwargs):
+        self._round_trip()
+        found = self._matching(query)
+        if found:
+            del self.docs[found[0]["_id"]]
+        return Result(len(found), len(found))
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        self._round_trip()
+        result = Result()
+        result.upserted_count = 0
+        for request in requests:
+            if hasattr(request, "_doc") and not hasattr(request, "_filter"):
+                self.docs[request._doc.setdefault("_id", next(self._ids))] = copy.deepcopy(request._doc)
+                continue
+            if type(request).__name__ == "ReplaceOne":
+                outcome = self._replace(request._filter, request._doc, request._upsert)
+            else:
+                outcome = self._update(request._filter, request._doc, request._upsert,
+                                       many=type(request).__name__ == "UpdateMany")
+            result.matched_count += outcome.matched_count
+            result.modified_count += outcome.modified_count
+            result.upserted_count += outcome.upserted_id is not None
+        return result
+
+    def create_index(self, keys, **options):
+        self._round_trip()
+        name = options.get("name") or "_".join(f"{key}_{direction}" for key, direction in keys)
+        self.indexes[name] = (keys, options)
+        return name
+
+class MemoryDatabase:
+    def __init__(self, client):
+        self._client = client
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self._client, name)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def command(self, name, *args, **kwargs):
+        self._client.round_trips += 1
+        return {"ok": 1.0}
+
+class MemoryMongoClient:
+    """Drop-in for MongoClient when passed to ``Database(client=...)``"""
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.round_trips = 0
+        self._databases = {}
+        self.admin = MemoryDatabase(self)
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(self)
+        return self._databases[name]
+
+    def get_database(self, name):
+        return self[name]
+
+    def close(self):
+        pass
@@ -0,0 +1,220 @@
+"""Micro-benchmarks for the bot's hot paths.
+
+Runs the spin, collection, search, embed, collection-update and pagination
+paths against an in-memory Mongo stand-in (a local mongod with --mongo-uri,
+or an in-memory SQLite database with --backend sqlite) using stubbed
+Discord objects, and reports ops/sec and
+database round trips per operation.
+
+    python benchmarks/run.py                      # run everything
+    python benchmarks/run.py --latency-ms 2       # simulate network round trips
+    python benchmarks/run.py --save before        # store a baseline
+    python benchmarks/run.py --compare before     # compare against it
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import database
+from config import RARE_CHARACTERS, UNCOMMON_CHARACTERS, COMMON_CHARACTERS
+from discord_stubs import StubUser, StubContext, StubInteraction
+from memory_mongo import MemoryMongoClient
+from sqlite_storage import SQLiteDatabase
+
+BENCH_SEED = 1234
+BENCH_USER_ID = 4242
+
+def make_cards(extra_cards: int) -> list:
+    """The configured characters plus ``extra_cards`` synthetic ones"""
+    rng = random.Random(BENCH_SEED)
+    named = (
+        [(name, "rare") for name in RARE_CHARACTERS] +
+        [(name, "uncommon") for name in UNCOMMON_CHARACTERS] +
+        [(name, "common") for name in COMMON_CHARACTERS]
+    )
+    named += [(f"Student {i:05d}", "common") for i in range(extra_cards)]
+
+    cards = []
+    for card_id, (name, rarity) in enumerate(named, start=1):
+        cards.append({
+            "_id": card_id,
+            "character_name": name,
+            "character_personality": "Calm and calculating",
+            "character_moves": "Scheming, Academic",
+            "character_url_image": f"https://example.com/cards/{card_id}.png",
+            "character_star": 1,
+            "character_resolve": rng.randint(40, 90),
+            "character_mental": rng.randint(40, 90),
+            "character_physical": rng.randint(40, 90),
+            "character_social": rng.randint(40, 90),
+            "character_initiative": rng.randint(40, 90),
+            "character_support_bonus": "+20% Mental to Class D allies",
+            "character_tags": rng.choice(["Class A", "Class B", "Class C", "Class D"]),
+            "character_rarity": rarity
+        })
+    return cards
+
+def setup_database(args):
+    """Point the global database objects at the stand-in and seed it"""
+    if args.backend == "sqlite":
+        db = SQLiteDatabase(":memory:")
+    elif args.mongo_uri:
+        db = database.Database(uri=args.mongo_uri)
+        db.cards.delete_many({})
+        db.students.delete_many({})
+    else:
+        db = database.Database(client=MemoryMongoClient(latency_ms=args.latency_ms))
+
+    db.upsert_cards(make_cards(args.cards))
+
+    db.catalog.seed = BENCH_SEED
+    db.reload_catalog()
+    db.create_user(BENCH_USER_ID, "bench-user", initial_ppt=10 ** 12)
+
+    database.db = db
+    database.adb = database.AsyncDatabase(db)
+    return db
+
+async def run_benchmark(name: str, operation, iterations: int) -> dict:
+    """Time ``operation`` and count its database round trips"""
+    # One warm-up call so lazy setup isn't measured
+    await operation()
+
+    durations = []
+    queries = 0
+    for _ in range(iterations):
+        with database.QueryCounter() as counter:
+            start = time.perf_counter()
+            await operation()
+            durations.append(time.perf_counter() - start)
+        queries += counter.count
+
+    total = sum(durations)
+    return {
+        "iterations": iterations,
+        "ops_per_sec": iterations / total if total else float("inf"),
+        "mean_ms": statistics.mean(durations) * 1000,
+        "p95_ms": sorted(durations)[int(0.95 * (len(durations) - 1))] * 1000,
+        "round_trips_per_op": queries / iterations
+    }
+
+def build_benchmarks(db, bot, utils, spins: int, pages: int):
+    author = StubUser(BENCH_USER_ID)
+    card = db.get_card_by_name(RARE_CHARACTERS[0])
+    owned = db.get_user(BENCH_USER_ID)["collection"].get(RARE_CHARACTERS[0])
+
+    async def confirm_spin():
+        ctx = StubContext(author)
+        view = bot.SpinView(ctx, spins)
+        await view.confirm_spin.callback(StubInteraction(author))
+
+    async def view_collection():
+        await bot.view_collection.callback(StubContext(author))
+
+    async def find_character():
+        await bot.find_character.callback(StubContext(author), character_name="ayanokji")
+
+    async def create_character_embed():
+        utils.create_character_embed(author, card, owned)
+
+    async def add_card_to_collection():
+        db.add_card_to_collection(BENCH_USER_ID, card)
+
+    async def pagination():
+        ctx = StubContext(author)
+        await utils.send_lazy_paginated_embeds(ctx, pages, lambda page: utils.create_character_embed(author, card, owned))
+        view = ctx.sent[-1].fields["view"]
+        for _ in range(pages - 1):
+            view.current_page += 1
+            view.get_page(view.current_page)
+
+    return {
+        "confirm_spin": confirm_spin,
+        "view_collection": view_collection,
+        "find_character": find_character,
+        "create_character_embed": create_character_embed,
+        "add_card_to_collection": add_card_to_collection,
+        "pagination": pagination
+    }
+
+def print_results(results: dict, baseline: dict = None):
+    header = f"{'benchmark':<26}{'ops/sec':>12}{'mean ms':>10}{'p95 ms':>10}{'trips/op':>10}"
+    if baseline:
+        header += f"{'vs base':>10}{'trips':>8}"
+    print(header)
+    for name, result in results.items():
+        line = (f"{name:<26}{result['ops_per_sec']:>12,.0f}{result['mean_ms']:>10.3f}"
+                f"{result['p95_ms']:>10.3f}{result['round_trips_per_op']:>10.1f}")
+        base = (baseline or {}).get(name)
+        if base:
+            change = result["ops_per_sec"] / base["ops_per_sec"] - 1 if base["ops_per_sec"] else 0.0
+            trips = result["round_trips_per_op"] - base["round_trips_per_op"]
+            line += f"{change:>+10.1%}{trips:>+8.1f}"
+        print(line)
+
+async def main_async(args):
+    db = setup_database(args)
+
+    # bot and utils bind the database objects at import time
+    import bot
+    import utils
+    from render import renderer
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Measure the database path: no art downloads or render_cache/ writes
+    renderer.enabled = False
+
+    # Give the user a full collection so !collection has something to render
+    db.batch_spin(BENCH_USER_ID, db.catalog.names() * 2)
+
+    benchmarks = build_benchmarks(db, bot, utils, args.spins, args.pages)
+    selected = args.only or list(benchmarks)
+
+    results = {}
+    for name in selected:
+        results[name] = await run_benchmark(name, benchmarks[name], args.iterations)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot's hot paths")
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per benchmark")
+    parser.add_argument("--only", nargs="+", help="benchmarks to run (default: all)")
+    parser.add_argument("--cards", type=int, default=0, help="extra synthetic cards in the catalog")
+    parser.add_argument("--spins", type=int, default=30, help="spins per confirm_spin call")
+    parser.add_argument("--pages", type=int, default=30, help="pages per pagination call")
+    parser.add_argument("--backend", choices=["mongodb", "sqlite"], default="mongodb", help="storage backend to benchmark")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency per database round trip")
+    parser.add_argument("--mongo-uri", help="benchmark a local mongod instead of the in-memory stand-in (its data is wiped)")
+    parser.add_argument("--save", metavar="NAME", help="save the results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="compare against baseline NAME")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(main_async(args))
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json"), encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"Saved baseline to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,27 @@ import os
 import logging
 import discord
 import asyncio
-import random
+import io
+import time
 from discord.ext import commands
-from database import db
+from database import db, adb, QueryCounter
+from scheduler import update_scheduler, interaction_bucket
+from metrics import metrics
+from catalog import catalog
+from render import renderer
+from throttle import throttle
+from sampler import default_spin_sampler
+from stats import LEADERBOARD_FIELDS
 from utils import (
-    create_character_embed, send_paginated_embeds, 
-    format_number, handle_error, ConfirmView
+    create_character_embed, send_lazy_paginated_embeds, 
+    format_number, handle_error, get_rarity_emoji
 )
 from config import (
-    DISCORD_TOKEN, COMMAND_PREFIX, ALL_CHARACTERS, 
-    SPIN_COST, MAX_SPINS_PER_COMMAND, INITIAL_PPT, INITIAL_BLACK_TOKENS
+    DISCORD_TOKEN, COMMAND_PREFIX, SPIN_SEED, 
+    SPIN_COST, MAX_SPINS_PER_COMMAND, INITIAL_PPT, INITIAL_BLACK_TOKENS,
+    METRICS_HOST, METRICS_PORT, METRICS_SNAPSHOT_PATH, METRICS_SNAPSHOT_INTERVAL,
+    SHARD_COUNT, SHARD_IDS, CATALOG_SNAPSHOT_PATH, CATALOG_SNAPSHOT_POLL_INTERVAL,
+    LEADERBOARD_SIZE, STATS_FLUSH_INTERVAL, STATS_RECONCILE_INTERVAL
 )
 
 # Set up logging
@@ -22,13 +33,113 @@ logger = logging.getLogger(__name__)
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents)
+if SHARD_COUNT or SHARD_IDS:
+    # Run only the given shards (all of them if SHARD_IDS is empty) on this process's loop
+    bot = commands.AutoShardedBot(
+        command_prefix=COMMAND_PREFIX, intents=intents,
+        shard_count=SHARD_COUNT or None, shard_ids=SHARD_IDS or None
+    )
+else:
+    bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents)
+
+# Sampler over the configured characters, used if the card catalog is empty
+fallback_sampler = default_spin_sampler(SPIN_SEED)
+
+async def setup_hook():
+    # Open the pool and load the catalog before the gateway connects,
+    # so the first commands don't pay for it. Shard workers get the catalog
+    # from the supervisor's snapshot, which also already ran the migrations.
+    if await adb.warm_up(migrate=not SHARD_IDS, catalog_snapshot=CATALOG_SNAPSHOT_PATH or None):
+        logger.info("Database warmed up")
+    else:
+        logger.warning("Database warm-up failed; will connect on first use")
+    
+    if METRICS_PORT:
+        await metrics.start_server(METRICS_HOST, METRICS_PORT)
+    if METRICS_SNAPSHOT_PATH:
+        asyncio.create_task(metrics.write_snapshots(METRICS_SNAPSHOT_PATH, METRICS_SNAPSHOT_INTERVAL))
+    asyncio.create_task(maintain_stats())
+    if CATALOG_SNAPSHOT_PATH:
+        asyncio.create_task(watch_catalog_snapshot())
+
+bot.setup_hook = setup_hook
+
+def snapshot_mtime():
+    """Modification time of the catalog snapshot, or None if it is missing"""
+    try:
+        return os.stat(CATALOG_SNAPSHOT_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+# Snapshot version this worker's catalog was loaded from or wrote
+snapshot_state = {"mtime": None}
+
+async def watch_catalog_snapshot():
+    """Reload the catalog when another shard worker rewrites the snapshot after !reloadcards"""
+    snapshot_state["mtime"] = snapshot_mtime()
+    while True:
+        await asyncio.sleep(CATALOG_SNAPSHOT_POLL_INTERVAL)
+        mtime = snapshot_mtime()
+        if mtime is None or mtime == snapshot_state["mtime"]:
+            continue
+        try:
+            count = await asyncio.to_thread(catalog.load_snapshot, CATALOG_SNAPSHOT_PATH)
+            snapshot_state["mtime"] = mtime
+            logger.info(f"Reloaded {count} cards from the updated catalog snapshot")
+        except Exception as e:
+            logger.error(f"Error reloading catalog snapshot {CATALOG_SNAPSHOT_PATH}: {e}")
+
+async def maintain_stats():
+    """Flush buffered stat counters regularly and reconcile them now and then"""
+    # With several shard processes only the one running shard 0 reconciles
+    reconciles = not SHARD_IDS or 0 in SHARD_IDS
+    last_reconcile = time.monotonic()
+    while True:
+        await asyncio.sleep(STATS_FLUSH_INTERVAL)
+        try:
+            await adb.flush_stats()
+            if reconciles and time.monotonic() - last_reconcile >= STATS_RECONCILE_INTERVAL:
+                last_reconcile = time.monotonic()
+                await adb.reconcile_stats()
+        except Exception as e:
+            logger.error(f"Error maintaining stats: {e}")
 
 @bot.event
 async def on_ready():
-    logger.info(f"Bot logged in as {bot.user.name}")
+    if SHARD_IDS:
+        logger.info(f"Bot logged in as {bot.user.name} running shards {SHARD_IDS} of {bot.shard_count}")
+    else:
+        logger.info(f"Bot logged in as {bot.user.name}")
     print(f"✅ {bot.user.name} is ready!")
 
+@bot.before_invoke
+async def start_command_tracking(ctx):
+    ctx.started_at = time.perf_counter()
+    ctx.query_counter = QueryCounter().start()
+
+@bot.after_invoke
+async def finish_command_tracking(ctx):
+    # Errors are counted by handle_error, which every command reports through
+    metrics.observe("command", ctx.command.name, time.perf_counter() - ctx.started_at)
+    counter = ctx.query_counter.stop()
+    logger.info(f"!{ctx.command.name} issued {counter.summary()}")
+
+# check_once runs once per invocation for the invoked command only; a plain
+# check would also run for every command the help command lists
+@bot.check_once
+async def throttle_commands(ctx):
+    """Refuse commands from users or guilds that are over their budget"""
+    retry_after, scope = throttle.hit(ctx.command.name, ctx.author.id, ctx.guild.id if ctx.guild else None)
+    if retry_after:
+        metrics.increment("throttled", ctx.command.name)
+        # Report the bucket that actually ran out
+        if scope == "guild":
+            (rate, per), bucket_type = throttle.guild_budget, commands.BucketType.guild
+        else:
+            (rate, per), bucket_type = throttle.budget(ctx.command.name), commands.BucketType.user
+        raise commands.CommandOnCooldown(commands.Cooldown(rate, per), retry_after, bucket_type)
+    return True
+
 @bot.event
 async def on_command_error(ctx, error):
     await handle_error(ctx, error, ctx.command.name if ctx.command else "unknown")
@@ -42,8 +153,7 @@ async def register_user(ctx):
         username = ctx.author.display_name
         
         # Check if user already exists
-        existing_user = db.get_user(user_id)
-        if existing_user:
+        if await adb.user_exists(user_id):
             embed = discord.Embed(
                 title="Already Registered!",
                 description="You are already registered in the system.",
@@ -53,7 +163,7 @@ async def register_user(ctx):
             return
         
         # Create new user
-        new_user = db.create_user(user_id, username, INITIAL_PPT, INITIAL_BLACK_TOKENS)
+        new_user = await adb.create_user(user_id, username, INITIAL_PPT, INITIAL_BLACK_TOKENS)
         if new_user:
             embed = discord.Embed(
                 title="Registration Successful!",
@@ -73,7 +183,7 @@ async def view_profile(ctx):
     """View your user profile"""
     try:
         user_id = ctx.author.id
-        user_data = db.get_user(user_id)
+        user_data = await adb.get_user_profile(user_id)
         
         if not user_data:
             embed = discord.Embed(
@@ -100,8 +210,7 @@ async def view_profile(ctx):
         embed.add_field(name="FTPS", value=user_data["ftps"], inline=True)
         
         # Collection info
-        collection = user_data.get("collection", {})
-        embed.add_field(name="Cards Collected", value=len(collection), inline=True)
+        embed.add_field(name="Cards Collected", value=user_data.get("collection_count", 0), inline=True)
         
         await ctx.send(embed=embed, delete_after=60)
         
@@ -113,7 +222,7 @@ async def view_profile(ctx):
 async def find_character(ctx, *, character_name: str):
     """Search for character cards by name"""
     try:
-        matching_cards = db.search_cards(character_name)
+        matching_cards = await adb.search_cards(character_name)
         
         if not matching_cards:
             embed = discord.Embed(
@@ -124,12 +233,10 @@ async def find_character(ctx, *, character_name: str):
             await ctx.send(embed=embed)
             return
         
-        embeds = []
-        for card_data in matching_cards:
-            embed = create_character_embed(ctx.author, card_data)
-            embeds.append(embed)
-        
-        await send_paginated_embeds(ctx, embeds)
+        await send_lazy_paginated_embeds(
+            ctx, len(matching_cards),
+            lambda page: create_character_embed(ctx.author, matching_cards[page])
+        )
         
     except Exception as e:
         await handle_error(ctx, e, "find")
@@ -140,7 +247,7 @@ async def view_collection(ctx):
     """View your character collection"""
     try:
         user_id = ctx.author.id
-        user_data = db.get_user(user_id)
+        user_data = await adb.get_user(user_id)
         
         if not user_data or not user_data.get("collection"):
             embed = discord.Embed(
@@ -152,15 +259,18 @@ async def view_collection(ctx):
             return
         
         collection = user_data["collection"]
-        embeds = []
-        
-        for character_name, character_data in collection.items():
-            card_data = db.get_card_by_name(character_name)
-            if card_data:
-                embed = create_character_embed(ctx.author, card_data, character_data)
-                embeds.append(embed)
+        cards = await adb.get_cards_by_names(collection.keys())
+        entries = [
+            (cards[character_name], character_data)
+            for character_name, character_data in collection.items()
+            if character_name in cards
+        ]
         
-        await send_paginated_embeds(ctx, embeds)
+        # Embeds are only built for the pages the user actually opens
+        await send_lazy_paginated_embeds(
+            ctx, len(entries),
+            lambda page: create_character_embed(ctx.author, *entries[page])
+        )
         
     except Exception as e:
         await handle_error(ctx, e, "collection")
@@ -173,80 +283,141 @@ class SpinView(discord.ui.View):
         self.num_spins = num_spins
         self.total_cost = num_spins * SPIN_COST
         self.spin_results = []
+    
+    def update_status(self, interaction: discord.Interaction, **changes):
+        """Queue an edit of the spin message without waiting on Discord"""
+        return update_scheduler.submit(
+            ("message", interaction.message.id),
+            lambda: interaction.edit_original_response(**changes),
+            bucket=interaction_bucket(interaction)
+        )
+    
+    def build_result_page(self, page: int) -> discord.Embed:
+        """Build the embed for one spin result"""
+        selected_character, character_data, user_character_data = self.spin_results[page]
+        if character_data:
+            return create_character_embed(self.ctx.author, character_data, user_character_data)
+        
+        # If no character data found, create a basic error embed but still count the spin
+        return discord.Embed(
+            title="Unknown Character",
+            description=f"Could not find data for {selected_character}",
+            color=discord.Color.orange()
+        )
         
     @discord.ui.button(label="Confirm Spin", style=discord.ButtonStyle.green, emoji="🎰")
     async def confirm_spin(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user != self.ctx.author:
             await interaction.response.send_message("This is not your spin!", ephemeral=True)
             return
-            
-        await interaction.response.defer()
+        if self.is_finished():
+            await interaction.response.send_message("This spin has already been handled.", ephemeral=True)
+            return
+        # Close the view before anything is awaited so a second click can't spin again
+        self.close()
+        
+        # Button callbacks don't go through the command hooks, so track here
+        with QueryCounter() as counter, metrics.timer("command", "spin_confirm"):
+            await self.run_spin(interaction)
+        logger.info(f"spin confirm issued {counter.summary()}")
+    
+    def close(self):
+        """Stop the view and disable its buttons"""
+        self.stop()
+        for item in self.children:
+            item.disabled = True
+    
+    async def run_spin(self, interaction: discord.Interaction):
+        """Charge the user, perform the spins and show the results"""
+        # Acknowledge the click by showing the disabled buttons
+        await interaction.response.edit_message(view=self)
         
-        # Check user has enough PPT
-        user_data = db.get_user(self.ctx.author.id)
-        if not user_data or user_data["ppt"] < self.total_cost:
+        # Claim the PPT up front; the balance check and deduction are one atomic update
+        reserved = await adb.reserve_ppt(self.ctx.author.id, self.total_cost)
+        if not reserved:
+            user_data = await adb.get_user_profile(self.ctx.author.id)
             embed = discord.Embed(
                 title="Insufficient PPT",
                 description=f"You need {format_number(self.total_cost)} PPT but only have {format_number(user_data['ppt'] if user_data else 0)}",
                 color=discord.Color.red()
             )
-            await interaction.edit_original_response(embed=embed, view=None)
+            self.update_status(interaction, embed=embed, view=None)
             return
         
         # Perform spins
         embed = discord.Embed(title="🎰 Spinning cards...", description="Please wait...")
-        await interaction.edit_original_response(embed=embed, view=None)
+        self.update_status(interaction, embed=embed, view=None)
         
-        for i in range(self.num_spins):
-            selected_character = random.choice(ALL_CHARACTERS)
-            character_data = db.get_card_by_name(selected_character)
-            
-            if character_data:
-                # Add to user's collection (this handles both new cards and upgrades)
-                db.add_card_to_collection(self.ctx.author.id, character_data)
-                
-                # ALWAYS get the updated character data and create an embed for each spin
-                updated_user = db.get_user(self.ctx.author.id)
-                user_character_data = updated_user["collection"].get(selected_character)
-                
-                embed = create_character_embed(self.ctx.author, character_data, user_character_data)
-                self.spin_results.append(embed)
+        # Draw every character up front and commit the whole batch at once
+        try:
+            sampler = catalog.sampler or fallback_sampler
+            selected_characters = sampler.draw_many(self.num_spins)
+            spin_result = await adb.batch_spin(self.ctx.author.id, selected_characters)
+        except Exception as e:
+            logger.error(f"Error performing spin for user {self.ctx.author.id}: {e}")
+            spin_result = None
+        
+        if not spin_result:
+            if await adb.refund_ppt(self.ctx.author.id, self.total_cost):
+                description = "Your spin could not be completed and your PPT has been refunded. Please try again."
             else:
-                # If no character data found, create a basic error embed but still count the spin
-                error_embed = discord.Embed(
-                    title="Unknown Character",
-                    description=f"Could not find data for {selected_character}",
-                    color=discord.Color.orange()
-                )
-                self.spin_results.append(error_embed)
-            
-            # Update progress every few spins
-            if (i + 1) % 3 == 0 or i == self.num_spins - 1:
-                progress_embed = discord.Embed(
-                    title="🎰 Spinning cards...", 
-                    description=f"Progress: {i+1}/{self.num_spins}"
+                logger.error(f"Could not refund {self.total_cost} PPT to user {self.ctx.author.id}")
+                description = (
+                    f"Your spin could not be completed and refunding your {format_number(self.total_cost)} PPT "
+                    "also failed. Please contact an admin."
                 )
-                await interaction.edit_original_response(embed=progress_embed)
+            embed = discord.Embed(title="Spin Failed", description=description, color=discord.Color.red())
+            self.update_status(interaction, embed=embed, view=None)
+            return
         
-        # Deduct PPT
-        db.update_user_ppt(self.ctx.author.id, -self.total_cost)
+        _, self.spin_results = spin_result
         
-        # Show results
-        if self.spin_results:
-            await send_paginated_embeds(self.ctx, self.spin_results)
+        # Show results as one grid image when rendering is available, otherwise page through embeds
+        if self.spin_results and not await self.send_result_grid():
+            await send_lazy_paginated_embeds(self.ctx, len(self.spin_results), self.build_result_page)
         
         final_embed = discord.Embed(
             title="Spin Complete!",
             description=f"Processed {self.num_spins} spins and obtained {len(self.spin_results)} results for {format_number(self.total_cost)} PPT",
             color=discord.Color.green()
         )
-        await interaction.edit_original_response(embed=final_embed, view=None)
+        self.update_status(interaction, embed=final_embed, view=None)
+    
+    async def send_result_grid(self) -> bool:
+        """Send every spin result as a single image; returns False if it couldn't be rendered"""
+        if not renderer.available:
+            return False
+        cards = [
+            (character_data, user_character_data)
+            for _, character_data, user_character_data in self.spin_results
+            if character_data
+        ]
+        if not cards:
+            return False
+        try:
+            image = await renderer.spin_grid(cards)
+        except Exception as e:
+            logger.error(f"Error rendering spin results for user {self.ctx.author.id}: {e}")
+            return False
+        
+        embed = discord.Embed(
+            title=f"🎰 {self.ctx.author.display_name}'s Spin Results",
+            description=" · ".join(f"{get_rarity_emoji(card['character_name'])} {card['character_name']}" for card, _ in cards),
+            color=discord.Color.gold()
+        )
+        embed.set_image(url="attachment://spin.png")
+        await self.ctx.send(embed=embed, file=discord.File(io.BytesIO(image), filename="spin.png"))
+        return True
     
     @discord.ui.button(label="Cancel", style=discord.ButtonStyle.red, emoji="❌")
     async def cancel_spin(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user != self.ctx.author:
             await interaction.response.send_message("This is not your spin!", ephemeral=True)
             return
+        if self.is_finished():
+            await interaction.response.send_message("This spin has already been handled.", ephemeral=True)
+            return
+        self.close()
             
         embed = discord.Embed(title="Spin Cancelled", color=discord.Color.red())
         await interaction.response.edit_message(embed=embed, view=None)
@@ -266,7 +437,7 @@ async def spin_cards(ctx, num_spins: int = 1):
             return
         
         # Check if user is registered
-        user_data = db.get_user(ctx.author.id)
+        user_data = await adb.get_user_profile(ctx.author.id)
         if not user_data:
             embed = discord.Embed(
                 title="Not Registered",
@@ -298,12 +469,11 @@ async def spin_cards(ctx, num_spins: int = 1):
 async def inject_ppt(ctx):
     """Add 100k PPT to your account (for testing)"""
     try:
-        user_data = db.get_user(ctx.author.id)
-        if not user_data:
+        if not await adb.user_exists(ctx.author.id):
             await ctx.send("You need to register first!")
             return
         
-        db.update_user_ppt(ctx.author.id, 100000)
+        await adb.update_user_ppt(ctx.author.id, 100000)
         embed = discord.Embed(
             title="PPT Injected!",
             description="Added 100,000 PPT to your account.",
@@ -314,6 +484,138 @@ async def inject_ppt(ctx):
     except Exception as e:
         await handle_error(ctx, e, "inject")
 
+# Leaderboard Command
+@bot.command(name='leaderboard')
+async def view_leaderboard(ctx, board: str = "ppt"):
+    """Show the top players by PPT, FTPS or cards collected"""
+    try:
+        board = board.lower()
+        if board not in LEADERBOARD_FIELDS:
+            embed = discord.Embed(
+                title="Unknown Leaderboard",
+                description=f"Choose one of: {', '.join(LEADERBOARD_FIELDS)}",
+                color=discord.Color.red()
+            )
+            await ctx.send(embed=embed)
+            return
+        
+        leaders = await adb.get_leaderboard(board, LEADERBOARD_SIZE)
+        if not leaders:
+            await ctx.send("Nobody is on the leaderboard yet!")
+            return
+        
+        medals = ["🥇", "🥈", "🥉"]
+        lines = [
+            f"{medals[rank] if rank < len(medals) else f'**{rank + 1}.**'} {leader['name']} — {format_number(leader['value'])}"
+            for rank, leader in enumerate(leaders)
+        ]
+        embed = discord.Embed(
+            title=f"🏆 {board.upper()} Leaderboard",
+            description="\n".join(lines),
+            color=discord.Color.gold()
+        )
+        embed.set_footer(text=f"Other boards: {', '.join(b for b in LEADERBOARD_FIELDS if b != board)}")
+        await ctx.send(embed=embed)
+        
+    except Exception as e:
+        await handle_error(ctx, e, "leaderboard")
+
+# Card Stats Command
+@bot.command(name='stats')
+async def card_stats(ctx, *, character_name: str):
+    """Show how often a card has been drawn and who owns it"""
+    try:
+        matching_cards = await adb.search_cards(character_name, 1)
+        if not matching_cards:
+            embed = discord.Embed(
+                title="No Results",
+                description=f"No characters found matching '{character_name}'",
+                color=discord.Color.red()
+            )
+            await ctx.send(embed=embed)
+            return
+        
+        name = matching_cards[0]["character_name"]
+        stats = await adb.get_card_stats(name)
+        totals = await adb.get_global_stats()
+        
+        embed = discord.Embed(
+            title=f"{get_rarity_emoji(name)} {name} — Stats",
+            color=discord.Color.blue()
+        )
+        owner_share = stats["owners"] / totals["players"] if totals["players"] else 0.0
+        embed.add_field(name="Owners", value=f"{format_number(stats['owners'])} ({owner_share:.1%} of players)", inline=True)
+        embed.add_field(name="Max Star Owners", value=format_number(stats["maxed"]), inline=True)
+        average_star = stats["stars"] / stats["owners"] if stats["owners"] else 0.0
+        embed.add_field(name="Average Star", value=f"{average_star:.2f}", inline=True)
+        
+        drop_share = stats["drops"] / totals["spins"] if totals["spins"] else 0.0
+        embed.add_field(name="Times Drawn", value=format_number(stats["drops"]), inline=True)
+        embed.add_field(name="Observed Drop Rate", value=f"{drop_share:.2%}", inline=True)
+        if catalog.sampler:
+            expected = catalog.sampler.probabilities().get(name, 0.0)
+            embed.add_field(name="Expected Drop Rate", value=f"{expected:.2%}", inline=True)
+        await ctx.send(embed=embed)
+        
+    except Exception as e:
+        await handle_error(ctx, e, "stats")
+
+# Reload Cards Command (admin only)
+@bot.command(name='reloadcards')
+@commands.has_permissions(administrator=True)
+async def reload_cards(ctx):
+    """Reload the card catalog after new cards are added"""
+    try:
+        card_count = await adb.reload_catalog()
+        if card_count is None:
+            raise Exception("Failed to reload card catalog")
+        
+        description = f"Loaded {format_number(card_count)} cards."
+        if CATALOG_SNAPSHOT_PATH:
+            # Other shard workers, and workers restarted later, load the catalog from the snapshot
+            await asyncio.to_thread(catalog.save_snapshot, CATALOG_SNAPSHOT_PATH)
+            snapshot_state["mtime"] = snapshot_mtime()
+            description += f" Other shard workers pick them up within {CATALOG_SNAPSHOT_POLL_INTERVAL} seconds."
+        
+        embed = discord.Embed(
+            title="Catalog Reloaded",
+            description=description,
+            color=discord.Color.green()
+        )
+        await ctx.send(embed=embed)
+        
+    except Exception as e:
+        await handle_error(ctx, e, "reloadcards")
+
+# Health Command (admin only)
+@bot.command(name='health')
+@commands.has_permissions(administrator=True)
+async def health_check(ctx):
+    """Show database connectivity and cache status"""
+    try:
+        health = await adb.health()
+        ping_ms = health["ping_ms"]
+        cache = health["user_cache"]
+        
+        embed = discord.Embed(
+            title="Bot Health",
+            color=discord.Color.green() if ping_ms is not None else discord.Color.red()
+        )
+        embed.add_field(name="Database", value=f"{ping_ms:.1f} ms" if ping_ms is not None else "Unreachable", inline=True)
+        embed.add_field(name="Gateway", value=f"{bot.latency * 1000:.1f} ms", inline=True)
+        embed.add_field(name="Catalog", value=f"{health['catalog_cards']} cards", inline=True)
+        if cache is not None:
+            embed.add_field(name="User Cache", value=f"{cache['size']} users, {cache['hit_rate']:.0%} hit rate", inline=True)
+        throttled = throttle.stats()["throttled"]
+        embed.add_field(name="Throttling", value=f"{throttled} commands refused, {adb.coalesced} reads shared", inline=True)
+        if isinstance(bot, commands.AutoShardedBot):
+            shards = ", ".join(f"{shard_id}: {latency * 1000:.0f} ms" for shard_id, latency in bot.latencies)
+            embed.add_field(name=f"Shards ({bot.shard_count} total)", value=shards or "None connected", inline=False)
+        await ctx.send(embed=embed)
+        
+    except Exception as e:
+        await handle_error(ctx, e, "health")
+
 # Help Command
 @bot.command(name='bothelp')
 async def custom_help(ctx):
@@ -330,7 +632,11 @@ async def custom_help(ctx):
         ("!find <name>", "Search for character cards"),
         ("!spin <amount>", "Spin for character cards (costs PPT)"),
         ("!collection", "View your card collection"),
+        ("!leaderboard [ppt|ftps|cards]", "Show the top players"),
+        ("!stats <name>", "Show ownership and drop stats for a card"),
         ("!inject", "Add 100k PPT (testing only)"),
+        ("!reloadcards", "Reload the card catalog (admin only)"),
+        ("!health", "Show database and cache status (admin only)"),
         ("!bothelp", "Show this help message")
     ]
     
@@ -352,6 +658,12 @@ def main():
     except Exception as e:
         logger.error(f"Failed to start bot: {e}")
         print(f"❌ Failed to start bot: {e}")
+    finally:
+        metrics.close()
+        renderer.close()
+        adb.shutdown()
+        db.flush_stats()
+        db.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
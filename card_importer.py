@@ -0,0 +1,187 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from catalog import validate_card
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+# Column names accepted in place of the card document field names
+FIELD_ALIASES = {
+    "id": "_id",
+    "card_id": "_id",
+    "character_id": "_id",
+    "name": "character_name"
+}
+
+def _normalize_row(row: dict) -> dict:
+    return {FIELD_ALIASES.get(key.strip(), key.strip()): value for key, value in row.items() if key}
+
+def read_rows(path: str, file_format: str = None):
+    """Yield ``(line_number, row)`` from a CSV, JSON or JSONL card file.
+
+    CSV and JSONL are streamed one row at a time. A JSON file must hold an
+    array of cards and is parsed in one go, so prefer JSONL for very large
+    catalogs.
+    """
+    file_format = file_format or os.path.splitext(path)[1].lstrip(".").lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield line_number, _normalize_row(row)
+        elif file_format in ("jsonl", "ndjson"):
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_number, _normalize_row(json.loads(line))
+        elif file_format == "json":
+            data = json.load(f)
+            if isinstance(data, dict):
+                data = [data]
+            for index, row in enumerate(data, start=1):
+                yield index, _normalize_row(row)
+        else:
+            raise ValueError(f"Unsupported card file format: {file_format!r}")
+
+def _batches(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def diff_card(existing: dict, card: dict) -> dict:
+    """Fields that would change: field -> (old, new)"""
+    if existing is None:
+        return {field: (None, value) for field, value in card.items()}
+    fields = set(existing) | set(card)
+    return {
+        field: (existing.get(field), card.get(field))
+        for field in sorted(fields)
+        if existing.get(field) != card.get(field)
+    }
+
+class ImportReport:
+    """Counts of what an import did (or would do, in a dry run)"""
+    def __init__(self):
+        self.rows = 0
+        self.invalid = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+
+    def __str__(self):
+        return (f"{self.rows} rows: {self.inserted} new, {self.updated} changed, "
+                f"{self.unchanged} unchanged, {self.invalid} invalid")
+
+def import_cards(database, rows, batch_size: int = DEFAULT_BATCH_SIZE,
+                 dry_run: bool = False, show_diff: bool = False, out=sys.stdout) -> ImportReport:
+    """Validate card rows and upsert them by ``_id`` in batched bulk writes.
+
+    Each batch costs one read to find what changed and one bulk write for
+    the new and changed cards; unchanged cards are not written at all.
+    Cards whose name is already stored under another ``_id`` are rejected
+    before the write, so a batch never fails halfway on the unique name index.
+    """
+    report = ImportReport()
+    seen_names = {}
+    seen_ids = {}
+
+    def valid_cards():
+        for line_number, row in rows:
+            report.rows += 1
+            card, errors = validate_card(row)
+            if card and card["_id"] in seen_ids:
+                # A later row would silently overwrite the earlier one in the upsert
+                errors = [f"_id {card['_id']} already used on row {seen_ids[card['_id']]}"]
+            elif card and card["character_name"] in seen_names:
+                errors = [f"character_name {card['character_name']!r} already used by card {seen_names[card['character_name']]}"]
+            if errors:
+                report.invalid += 1
+                print(f"Row {line_number}: " + "; ".join(errors), file=out)
+                continue
+            seen_names[card["character_name"]] = card["_id"]
+            seen_ids[card["_id"]] = line_number
+            yield card
+
+    for batch in _batches(valid_cards(), batch_size):
+        stored = database.get_cards_by_ids(
+            [card["_id"] for card in batch],
+            [card["character_name"] for card in batch]
+        )
+        stored_names = {card["character_name"]: card_id for card_id, card in stored.items()}
+
+        changed = []
+        for card in batch:
+            owner = stored_names.get(card["character_name"], card["_id"])
+            if owner != card["_id"]:
+                report.invalid += 1
+                print(f"Card {card['_id']}: character_name {card['character_name']!r} already used by stored card {owner}", file=out)
+                continue
+
+            old = stored.get(card["_id"])
+            changes = diff_card(old, card)
+            if not changes:
+                report.unchanged += 1
+                continue
+
+            if old is None:
+                report.inserted += 1
+            else:
+                report.updated += 1
+
+            if show_diff:
+                label = "+" if old is None else "~"
+                print(f"{label} [{card['_id']}] {card['character_name']}", file=out)
+                if old is not None:
+                    for field, (before, after) in changes.items():
+                        print(f"    {field}: {before!r} -> {after!r}", file=out)
+
+            changed.append(card)
+
+        if changed and not dry_run:
+            database.upsert_cards(changed)
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import character cards from CSV, JSON or JSONL")
+    parser.add_argument("path", help="card file to import")
+    parser.add_argument("--format", choices=["csv", "json", "jsonl"], help="file format (default: from the extension)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="cards per bulk write")
+    parser.add_argument("--dry-run", action="store_true", help="validate and report without writing anything")
+    parser.add_argument("--diff", action="store_true", help="print every new card and changed field")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from database import create_database
+    database = create_database()
+    try:
+        start = time.perf_counter()
+        report = import_cards(
+            database,
+            read_rows(args.path, args.format),
+            batch_size=args.batch_size,
+            dry_run=args.dry_run,
+            show_diff=args.diff
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        database.close()
+
+    prefix = "Dry run: " if args.dry_run else ""
+    print(f"{prefix}{report} in {elapsed:.2f}s")
+    if not args.dry_run and (report.inserted or report.updated):
+        print("Run !reloadcards to load the new cards into the running bot.")
+    sys.exit(1 if report.invalid else 0)
+
+if __name__ == "__main__":
+    main()
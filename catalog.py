@@ -0,0 +1,191 @@
+import json
+import logging
+import math
+import os
+from config import (
+    RARE_CHARACTERS, UNCOMMON_CHARACTERS, COMMON_CHARACTERS,
+    EMOJIS, RARITY_WEIGHTS, SPIN_SEED
+)
+from sampler import AliasSampler
+from search import CardSearchIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RARITY = "common"
+
+# Rarities for cards stored before character_rarity was added to the card documents
+LEGACY_RARITIES = {
+    **{name: "common" for name in COMMON_CHARACTERS},
+    **{name: "uncommon" for name in UNCOMMON_CHARACTERS},
+    **{name: "rare" for name in RARE_CHARACTERS}
+}
+
+# Card document fields: name -> (type, required). These are the fields
+# create_character_embed and the collection code read from a card.
+CARD_SCHEMA = {
+    "_id": (int, True),
+    "character_name": (str, True),
+    "character_personality": (str, True),
+    "character_moves": (str, True),
+    "character_url_image": (str, True),
+    "character_star": (int, True),
+    "character_resolve": (int, True),
+    "character_mental": (int, True),
+    "character_physical": (int, True),
+    "character_social": (int, True),
+    "character_initiative": (int, True),
+    "character_support_bonus": (str, False),
+    "character_tags": (str, False),
+    "character_rarity": (str, False),
+    "character_weight": (float, False)
+}
+
+def validate_card(data: dict):
+    """Check a card against CARD_SCHEMA, converting values to the right types.
+
+    Returns ``(card, errors)``; ``card`` is ``None`` if there were errors.
+    Unknown fields are dropped and empty optional fields are left out.
+    """
+    card = {}
+    errors = []
+    for field, (field_type, required) in CARD_SCHEMA.items():
+        value = data.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            if required:
+                errors.append(f"missing {field}")
+            continue
+        try:
+            if field_type is int:
+                # Accept "3" and 3.0 from CSV/JSON, but not 3.5
+                number = float(value)
+                if not number.is_integer():
+                    raise ValueError(value)
+                value = int(number)
+            card[field] = field_type(value)
+        except (TypeError, ValueError):
+            errors.append(f"{field} must be {field_type.__name__}, got {value!r}")
+
+    if "character_star" in card and not 1 <= card["character_star"] <= 5:
+        errors.append(f"character_star must be between 1 and 5, got {card['character_star']}")
+    if "character_rarity" in card and card["character_rarity"] not in EMOJIS:
+        errors.append(f"character_rarity must be one of {', '.join(EMOJIS)}, got {card['character_rarity']!r}")
+    if not math.isfinite(card.get("character_weight", 0)):
+        errors.append(f"character_weight must be a finite number, got {card['character_weight']!r}")
+    elif card.get("character_weight", 0) < 0:
+        errors.append("character_weight must not be negative")
+
+    return (None, errors) if errors else (card, [])
+
+def card_rarity(card: dict) -> str:
+    """Rarity of a card document"""
+    return card.get("character_rarity") or LEGACY_RARITIES.get(card["character_name"], DEFAULT_RARITY)
+
+class CardCatalog:
+    """In-memory copy of the cards collection indexed by name and id"""
+    def __init__(self, rarity_weights: dict = None, seed=None):
+        self.rarity_weights = rarity_weights if rarity_weights is not None else RARITY_WEIGHTS
+        self.seed = seed
+        self.by_name = {}
+        self.by_id = {}
+        self.rarity_by_name = {}
+        self.emoji_by_name = {}
+        self.sampler = None
+        self.search_index = CardSearchIndex()
+        self.loaded = False
+
+    def load(self, cards) -> int:
+        """Replace the catalog contents with the given card documents"""
+        by_name = {}
+        by_id = {}
+        rarity_by_name = {}
+        emoji_by_name = {}
+        for card in cards:
+            character_name = card["character_name"]
+            rarity = card_rarity(card)
+            by_name[character_name] = card
+            rarity_by_name[character_name] = rarity
+            emoji_by_name[character_name] = EMOJIS.get(rarity, "")
+            if "_id" in card:
+                by_id[card["_id"]] = card
+
+        sampler = self._build_sampler(by_name, rarity_by_name)
+        search_index = CardSearchIndex(by_name.values())
+
+        # Swap the indexes in one step so readers never see a half-built catalog
+        self.by_name, self.by_id = by_name, by_id
+        self.rarity_by_name, self.emoji_by_name = rarity_by_name, emoji_by_name
+        self.sampler = sampler
+        self.search_index = search_index
+        self.loaded = True
+        logger.info(f"Loaded {len(by_name)} cards into the catalog")
+        return len(by_name)
+
+    def save_snapshot(self, path: str) -> int:
+        """Write the catalog's cards to a JSON file, atomically replacing ``path``"""
+        cards = list(self.by_name.values())
+        # Per-process temp file: shard workers may rewrite the snapshot at the same time
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(cards, f, default=str)
+        os.replace(temp_path, path)
+        return len(cards)
+
+    def load_snapshot(self, path: str) -> int:
+        """Load the catalog from a file written by ``save_snapshot``"""
+        with open(path, encoding="utf-8") as f:
+            return self.load(json.load(f))
+
+    def _build_sampler(self, by_name: dict, rarity_by_name: dict):
+        """Spin sampler weighted by each card's character_weight or its rarity weight"""
+        names = []
+        weights = []
+        for character_name, card in by_name.items():
+            weight = card.get("character_weight")
+            if weight is None:
+                weight = self.rarity_weights.get(rarity_by_name[character_name], 0.0)
+            names.append(character_name)
+            weights.append(weight)
+
+        try:
+            return AliasSampler(names, weights, self.seed)
+        except ValueError as e:
+            logger.warning(f"No spinnable cards in the catalog: {e}")
+            return None
+
+    def get_by_name(self, character_name: str):
+        """Get a card by character name"""
+        return self.by_name.get(character_name)
+
+    def get_by_id(self, card_id):
+        """Get a card by its id"""
+        return self.by_id.get(card_id)
+
+    def get_rarity(self, character_name: str) -> str:
+        """Get the rarity of a character"""
+        rarity = self.rarity_by_name.get(character_name)
+        if rarity is None:
+            return LEGACY_RARITIES.get(character_name, DEFAULT_RARITY)
+        return rarity
+
+    def get_rarity_emoji(self, character_name: str) -> str:
+        """Get the emoji for a character's rarity"""
+        emoji = self.emoji_by_name.get(character_name)
+        if emoji is None:
+            return EMOJIS.get(self.get_rarity(character_name), "")
+        return emoji
+
+    def search(self, search_term: str, limit: int = None) -> list:
+        """Cards whose name or tags match ``search_term``, best match first"""
+        return self.search_index.search(search_term, limit)
+
+    def names(self) -> list:
+        """All character names in the catalog"""
+        return list(self.by_name)
+
+    def __len__(self):
+        return len(self.by_name)
+
+# Global catalog instance
+catalog = CardCatalog(RARITY_WEIGHTS, SPIN_SEED)
\ No newline at end of file
@@ -1,47 +1,356 @@
-from pymongo import MongoClient
-from config import MONGODB_URI, DB_NAME, COLLECTIONS
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReplaceOne, ReturnDocument, UpdateOne
+from config import (
+    MONGODB_URI, DB_NAME, COLLECTIONS, DB_MAX_WORKERS, SEARCH_RESULT_LIMIT,
+    USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_READS, MONGODB_APP_NAME, MONGODB_MAX_POOL_SIZE,
+    MONGODB_MIN_POOL_SIZE, MONGODB_MAX_IDLE_TIME_MS, MONGODB_CONNECT_TIMEOUT_MS,
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS, MONGODB_SOCKET_TIMEOUT_MS, MONGODB_COMPRESSORS,
+    STORAGE_BACKEND, SQLITE_PATH
+)
+from cache import TTLCache
+from catalog import catalog
+from migrations import run_migrations
+from metrics import metrics
+from search import MAX_QUERY_LENGTH
+from stats import CARD_STAT_FIELDS, TOTAL_STAT_FIELDS
+from storage import (
+    Storage, QueryCounter, record_query, new_collection_entry, plan_spin_entries, apply_spin,
+    is_legacy_entry, compact_collection_entry, MAX_STAR, PROFILE_FIELDS
+)
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import datetime
+import functools
 import logging
+import re
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
-class Database:
-    def __init__(self):
+SPIN_COMMIT_RETRIES = 3
+TOTALS_DOCUMENT_ID = "totals"  # meta document holding the global stat counters
+
+# Reads that AsyncDatabase shares between identical concurrent calls;
+# callers must treat their results as read-only
+COALESCED_READS = frozenset({
+    "get_user", "get_user_profile", "user_exists", "get_user_collection",
+    "get_card_by_name", "get_cards_by_names", "search_cards",
+    "get_leaderboard", "get_card_stats", "get_global_stats"
+})
+
+def _plan_spin(owned: dict, character_names: list, cards: dict, query: dict):
+    """Work out the field-level update for a batch of spins.
+
+    ``owned`` is the user's collection as read before the spin. Guards on
+    the planned-from state are added to ``query`` so the update only
+    applies if those entries haven't changed in the meantime.
+    """
+    entries, results = plan_spin_entries(owned, character_names, cards)
+    
+    update = {}
+    for character_name, entry in entries.items():
+        field = f"collection.{character_name}"
+        if character_name not in owned:
+            query[field] = {"$exists": False}
+            update.setdefault("$set", {})[field] = entry
+            increments = update.setdefault("$inc", {})
+            increments["collection_count"] = increments.get("collection_count", 0) + 1
+            continue
+        
+        current_star = owned[character_name].get("Star", 1)
+        steps = entry["Star"] - current_star
+        if is_legacy_entry(owned[character_name]):
+            # plan_spin_entries compacted the full copy; replace it whole
+            query[f"{field}.Star"] = current_star
+            query[f"{field}.Mental"] = {"$exists": True}
+            update.setdefault("$set", {})[field] = entry
+        elif steps:
+            query[f"{field}.Star"] = current_star
+            update.setdefault("$inc", {})[f"{field}.Star"] = steps
+    return update, entries, results
+
+# Collection methods that cost a round trip to Mongo
+QUERY_OPERATIONS = {
+    "find", "find_one", "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "bulk_write", "count_documents", "aggregate", "distinct"
+}
+
+class CountedCollection:
+    """Proxy for a pymongo collection that reports each query to the active QueryCounter"""
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in QUERY_OPERATIONS:
+            return attr
+
+        operation_name = f"{self._collection.name}.{name}"
+
+        @functools.wraps(attr)
+        def operation(*args, **kwargs):
+            record_query(operation_name)
+            with metrics.timer("mongo", operation_name):
+                return attr(*args, **kwargs)
+
+        return operation
+
+class Database(Storage):
+    """MongoDB-backed storage for cards and students.
+
+    Creating a Database does no I/O: the client is only opened on first use
+    or by ``connect()``/``warm_up()``, so importing this module works offline.
+    """
+    def __init__(self, uri: str = MONGODB_URI, client=None, cache_reads: bool = USER_CACHE_READS):
+        super().__init__()
+        self.uri = uri
+        self.catalog = catalog
+        self.user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+        # When false, reads shown to users skip the cache; spins still plan from it
+        # since their writes are guarded against stale data
+        self.cache_reads = cache_reads
+        self._client = client
+        self._collections = None
+        self._connect_lock = threading.Lock()
+
+    def connect(self):
+        """Open the client and collection handles if that hasn't happened yet"""
+        if self._collections is not None:
+            return
+        with self._connect_lock:
+            if self._collections is not None:
+                return
+            try:
+                if self._client is None:
+                    self._client = MongoClient(
+                        self.uri,
+                        appname=MONGODB_APP_NAME,
+                        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                        minPoolSize=MONGODB_MIN_POOL_SIZE,
+                        maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+                        connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+                        serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                        socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+                        compressors=MONGODB_COMPRESSORS
+                    )
+                database = self._client[DB_NAME]
+                self._collections = {
+                    name: CountedCollection(database[collection_name])
+                    for name, collection_name in COLLECTIONS.items()
+                }
+                self._collections["db"] = database
+                logger.info("Database connection established successfully")
+            except Exception as e:
+                logger.error(f"Failed to connect to database: {e}")
+                raise
+
+    @property
+    def client(self):
+        if self._collections is None:
+            self.connect()
+        return self._client
+
+    @property
+    def db(self):
+        if self._collections is None:
+            self.connect()
+        return self._collections["db"]
+
+    @property
+    def cards(self):
+        if self._collections is None:
+            self.connect()
+        return self._collections["cards"]
+
+    @property
+    def students(self):
+        if self._collections is None:
+            self.connect()
+        return self._collections["students"]
+
+    @property
+    def battle(self):
+        if self._collections is None:
+            self.connect()
+        return self._collections["battle"]
+
+    @property
+    def temp(self):
+        if self._collections is None:
+            self.connect()
+        return self._collections["temp"]
+
+    @property
+    def meta(self):
+        if self._collections is None:
+            self.connect()
+        return self._collections["meta"]
+
+    @property
+    def card_stats(self):
+        if self._collections is None:
+            self.connect()
+        return self._collections["card_stats"]
+
+    def warm_up(self, migrate: bool = True, catalog_snapshot: str = None) -> bool:
+        """Connect, check the server is reachable, migrate and load the card catalog.
+
+        Called before the bot starts taking commands so the first user
+        doesn't pay for connection setup and catalog loading. Shard workers
+        skip the migrations (the supervisor has run them) and load the
+        catalog from the supervisor's snapshot file instead of MongoDB.
+        """
+        if self.ping() is None:
+            return False
+        if migrate:
+            try:
+                version = run_migrations(self)
+                logger.info(f"Database schema at version {version}")
+                # Spins and upgrades compact legacy entries themselves, so serving on is safe
+            except Exception as e:
+                logger.error(f"Error running migrations: {e}")
+        if catalog_snapshot:
+            try:
+                self.catalog.load_snapshot(catalog_snapshot)
+                return True
+            except Exception as e:
+                logger.error(f"Error loading catalog snapshot {catalog_snapshot}, reading MongoDB instead: {e}")
+        return self.reload_catalog() is not None
+
+    def ping(self):
+        """Round-trip a ping to the server; returns the latency in ms or None"""
+        try:
+            start = time.perf_counter()
+            self.client.admin.command("ping")
+            return (time.perf_counter() - start) * 1000
+        except Exception as e:
+            logger.error(f"Database ping failed: {e}")
+            return None
+
+    def health(self) -> dict:
+        """Connection and cache status for health checks"""
+        connected = self._collections is not None
+        return {
+            "connected": connected,
+            "ping_ms": self.ping() if connected else None,
+            "catalog_loaded": self.catalog.loaded,
+            "catalog_cards": len(self.catalog),
+            "user_cache": self.user_cache.stats()
+        }
+
+    def close(self):
+        """Close the client and its connection pool"""
+        with self._connect_lock:
+            if self._client is not None:
+                self._client.close()
+                logger.info("Database connection closed")
+            self._client = None
+            self._collections = None
+
+    def reload_catalog(self):
+        """Reload the in-memory card catalog from the cards collection"""
         try:
-            self.client = MongoClient(MONGODB_URI)
-            self.db = self.client[DB_NAME]
-            self.cards = self.db[COLLECTIONS['cards']]
-            self.students = self.db[COLLECTIONS['students']]
-            self.battle = self.db[COLLECTIONS['battle']]
-            self.temp = self.db[COLLECTIONS['temp']]
-            logger.info("Database connection established successfully")
+            return self.catalog.load(self.cards.find({}))
         except Exception as e:
-            logger.error(f"Failed to connect to database: {e}")
-            raise
+            logger.error(f"Error loading card catalog: {e}")
+            return None
 
     def get_card_by_name(self, character_name: str):
         """Get a character card by name"""
+        if self.catalog.loaded:
+            return self.catalog.get_by_name(character_name)
         try:
             return self.cards.find_one({"character_name": character_name})
         except Exception as e:
             logger.error(f"Error fetching card {character_name}: {e}")
             return None
 
-    def search_cards(self, search_term: str):
-        """Search for cards by name (case-insensitive)"""
+    def get_cards_by_names(self, character_names) -> dict:
+        """Get several character cards at once, keyed by name"""
+        character_names = set(character_names)
+        if self.catalog.loaded:
+            cards = {}
+            for name in character_names:
+                card = self.catalog.get_by_name(name)
+                if card:
+                    cards[name] = card
+            return cards
+        try:
+            cards = self.cards.find({"character_name": {"$in": list(character_names)}})
+            return {card["character_name"]: card for card in cards}
+        except Exception as e:
+            logger.error(f"Error fetching cards {character_names}: {e}")
+            return {}
+
+    def search_cards(self, search_term: str, limit: int = SEARCH_RESULT_LIMIT):
+        """Search for cards by name or tags, best match first"""
+        if self.catalog.loaded:
+            return self.catalog.search(search_term, limit)
         try:
-            return list(self.cards.find({"character_name": {"$regex": search_term, "$options": "i"}}))
+            # Catalog unavailable: fall back to a literal (escaped) substring match
+            pattern = re.escape(search_term[:MAX_QUERY_LENGTH])
+            return list(self.cards.find({"character_name": {"$regex": pattern, "$options": "i"}}).limit(limit))
         except Exception as e:
             logger.error(f"Error searching cards with term {search_term}: {e}")
             return []
 
-    def get_user(self, user_id: int):
-        """Get user data by Discord ID"""
+    def get_cards_by_ids(self, card_ids, names=()) -> dict:
+        """Stored cards with the given ids or any of ``names``, keyed by id (bypasses the catalog)"""
+        query = {"_id": {"$in": list(card_ids)}}
+        if names:
+            query = {"$or": [query, {"character_name": {"$in": list(names)}}]}
+        return {card["_id"]: card for card in self.cards.find(query)}
+
+    def upsert_cards(self, cards) -> int:
+        """Insert or replace cards by ``_id`` in one unordered bulk write"""
+        operations = [ReplaceOne({"_id": card["_id"]}, card, upsert=True) for card in cards]
+        if not operations:
+            return 0
+        self.cards.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def get_user(self, user_id: int, use_cache: bool = None):
+        """Get user data by Discord ID; ``use_cache`` defaults to ``cache_reads``"""
+        if use_cache is None:
+            use_cache = self.cache_reads
+        if use_cache:
+            user = self.user_cache.get(user_id)
+            if user is not None:
+                return user
         try:
-            return self.students.find_one({"_id": user_id})
+            user = self.students.find_one({"_id": user_id})
+            self._cache_user(user_id, user)
+            return user
         except Exception as e:
             logger.error(f"Error fetching user {user_id}: {e}")
             return None
 
+    def get_user_profile(self, user_id: int):
+        """Get the profile fields of a user without the collection map"""
+        user = self.user_cache.get(user_id) if self.cache_reads else None
+        if user is not None:
+            profile = {field: user.get(field) for field in PROFILE_FIELDS}
+            profile["_id"] = user_id
+            profile["collection_count"] = len(user.get("collection", {}))
+            return profile
+        try:
+            return self.students.find_one({"_id": user_id}, PROFILE_FIELDS)
+        except Exception as e:
+            logger.error(f"Error fetching profile for user {user_id}: {e}")
+            return None
+
+    def user_exists(self, user_id: int) -> bool:
+        """Check whether a user is registered"""
+        if self.cache_reads and self.user_cache.get(user_id) is not None:
+            return True
+        try:
+            return self.students.find_one({"_id": user_id}, {"_id": 1}) is not None
+        except Exception as e:
+            logger.error(f"Error checking user {user_id}: {e}")
+            return False
+
     def create_user(self, user_id: int, username: str, initial_ppt: int = 100000, initial_tokens: int = 30):
         """Create a new user"""
         try:
@@ -51,9 +360,12 @@ class Database:
                 "ppt": initial_ppt,
                 "black_token": initial_tokens,
                 "ftps": 0,
-                "collection": {}
+                "collection": {},
+                "collection_count": 0
             }
             self.students.insert_one(user_data)
+            self.user_cache.set(user_id, user_data)
+            self.stat_counters.add_total(players=1, ppt=initial_ppt)
             logger.info(f"Created new user: {username} ({user_id})")
             return user_data
         except Exception as e:
@@ -63,10 +375,14 @@ class Database:
     def update_user_ppt(self, user_id: int, amount: int):
         """Update user's PPT (add or subtract)"""
         try:
-            self.students.update_one(
+            user = self.students.find_one_and_update(
                 {"_id": user_id},
-                {"$inc": {"ppt": amount}}
+                {"$inc": {"ppt": amount}},
+                return_document=ReturnDocument.AFTER
             )
+            self._cache_user(user_id, user)
+            if user:
+                self.stat_counters.add_total(ppt=amount)
             return True
         except Exception as e:
             logger.error(f"Error updating PPT for user {user_id}: {e}")
@@ -76,43 +392,153 @@ class Database:
         """Add a card to user's collection or upgrade existing one"""
         try:
             character_name = character_data["character_name"]
-            user = self.get_user(user_id)
+            field = f"collection.{character_name}"
             
-            if not user:
-                return False
-                
-            if "collection" not in user:
-                user["collection"] = {}
+            # Create the entry only if the user doesn't own the card yet
+            user = self.students.find_one_and_update(
+                {"_id": user_id, field: {"$exists": False}},
+                {"$set": {field: new_collection_entry(character_data)}, "$inc": {"collection_count": 1}},
+                return_document=ReturnDocument.AFTER
+            )
+            if user:
+                self._cache_user(user_id, user)
+                entry = user["collection"][character_name]
+                self._record_spin_stats({}, {character_name: entry}, [(character_name, character_data, entry)])
+                return True
             
-            # If character doesn't exist in collection, add it
-            if character_name not in user["collection"]:
-                user["collection"][character_name] = {
-                    "Mental": character_data.get("character_mental", 0),
-                    "Physical": character_data.get("character_physical", 0),
-                    "Social": character_data.get("character_social", 0),
-                    "Resolve": character_data.get("character_resolve", 0),
-                    "Initiative": character_data.get("character_initiative", 0),
-                    "Support_Bonus": character_data.get("character_support_bonus", ""),
-                    "Tags": character_data.get("character_tags", ""),
-                    "Star": character_data.get("character_star", 1)
-                }
-            else:
-                # Upgrade existing character
-                current_star = user["collection"][character_name].get("Star", 1)
-                if current_star < 5:
-                    user["collection"][character_name]["Star"] = current_star + 1
-                    # Increase stats
-                    stats_to_increase = ["Mental", "Physical", "Social", "Initiative", "Resolve"]
-                    for stat in stats_to_increase:
-                        user["collection"][character_name][stat] += 20
+            # Otherwise upgrade in place; the filter caps stars at MAX_STAR and
+            # leaves legacy full-copy entries to the conversion below
+            user = self.students.find_one_and_update(
+                {"_id": user_id, f"{field}.Star": {"$lt": MAX_STAR}, f"{field}.Mental": {"$exists": False}},
+                {"$inc": {f"{field}.Star": 1}},
+                return_document=ReturnDocument.AFTER
+            )
+            if user:
+                self._cache_user(user_id, user)
+                entry = user["collection"][character_name]
+                before = {character_name: {"Star": entry["Star"] - 1}}
+                self._record_spin_stats(before, {character_name: entry}, [(character_name, character_data, entry)])
+                return True
             
-            self.students.update_one({"_id": user_id}, {"$set": user})
+            # Nothing matched: the user doesn't exist, the card is maxed out, or
+            # it is a legacy entry the compaction migration hasn't reached yet
+            user = self.students.find_one({"_id": user_id}, {field: 1})
+            if not user:
+                return False
+            legacy = (user.get("collection") or {}).get(character_name)
+            if legacy and is_legacy_entry(legacy):
+                # Compact it while upgrading so its copied stats don't go stale
+                entry = apply_spin(compact_collection_entry(legacy, character_data), character_data)
+                user = self.students.find_one_and_update(
+                    {"_id": user_id, f"{field}.Star": legacy.get("Star", 1), f"{field}.Mental": {"$exists": True}},
+                    {"$set": {field: entry}},
+                    return_document=ReturnDocument.AFTER
+                )
+                if not user:
+                    logger.warning(f"Legacy entry {character_name} of user {user_id} changed while upgrading it")
+                    self.user_cache.pop(user_id)
+                    return False
+                self._cache_user(user_id, user)
+                before = {character_name: {"Star": legacy.get("Star", 1)}}
+                self._record_spin_stats(before, {character_name: entry}, [(character_name, character_data, entry)])
+                return True
+            maxed = {character_name: {"Star": MAX_STAR}}
+            self._record_spin_stats(maxed, maxed, [(character_name, character_data, maxed[character_name])])
             return True
             
         except Exception as e:
             logger.error(f"Error adding card to collection for user {user_id}: {e}")
             return False
 
+    def reserve_ppt(self, user_id: int, amount: int):
+        """Atomically take ``amount`` PPT if the user has at least that much.
+
+        The balance check and the deduction happen in one conditional
+        update, so concurrent spends can never overdraw. Returns the updated
+        user document, or ``None`` if the user is missing or can't afford it.
+        """
+        try:
+            user = self.students.find_one_and_update(
+                {"_id": user_id, "ppt": {"$gte": amount}},
+                {"$inc": {"ppt": -amount}},
+                return_document=ReturnDocument.AFTER
+            )
+            if user:
+                self._cache_user(user_id, user)
+                self.stat_counters.add_total(ppt=-amount)
+            else:
+                self.user_cache.pop(user_id)
+            return user
+        except Exception as e:
+            logger.error(f"Error reserving {amount} PPT for user {user_id}: {e}")
+            return None
+
+    def refund_ppt(self, user_id: int, amount: int):
+        """Give back PPT taken by reserve_ppt for work that didn't happen"""
+        logger.info(f"Refunding {amount} PPT to user {user_id}")
+        return self.update_user_ppt(user_id, amount)
+
+    def batch_spin(self, user_id: int, character_names: list):
+        """Apply a batch of spins to a user's collection in a single update.
+
+        The cost must already have been taken with ``reserve_ppt``. Only the
+        touched ``collection.<name>`` fields are written. The update is
+        guarded on the star levels it was planned from, so a concurrent
+        change to the same cards makes it re-plan instead of overwriting.
+
+        Returns ``(user, results)`` where ``results`` holds one
+        ``(character_name, card_data, user_character_data)`` tuple per spin,
+        or ``None`` if the user is missing or the update kept conflicting.
+        """
+        try:
+            cards = self.get_cards_by_names(character_names)
+            
+            for attempt in range(SPIN_COMMIT_RETRIES):
+                # Plan from the cache first; retries re-read the authoritative copy
+                from_cache = attempt == 0
+                user = self.get_user(user_id, use_cache=from_cache)
+                if not user:
+                    if from_cache:
+                        continue
+                    return None
+                
+                owned = user.get("collection", {})
+                query = {"_id": user_id}
+                update, entries, results = _plan_spin(owned, character_names, cards, query)
+                if not update:
+                    # Only maxed-out or unknown cards were drawn
+                    self._record_spin_stats(owned, entries, results)
+                    return user, results
+                
+                updated_user = self.students.find_one_and_update(
+                    query,
+                    update,
+                    return_document=ReturnDocument.AFTER
+                )
+                if updated_user:
+                    self._cache_user(user_id, updated_user)
+                    self._record_spin_stats(owned, entries, results)
+                    return updated_user, results
+                self.user_cache.pop(user_id)
+            
+            logger.warning(f"Gave up committing spin for user {user_id} after {SPIN_COMMIT_RETRIES} conflicts")
+            return None
+            
+        except Exception as e:
+            logger.error(f"Error spinning cards for user {user_id}: {e}")
+            return None
+
+    def _cache_user(self, user_id: int, user):
+        """Write an updated user document through to the cache"""
+        if user:
+            self.user_cache.set(user_id, user)
+        else:
+            self.user_cache.pop(user_id)
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters of the user cache"""
+        return self.user_cache.stats()
+
     def get_user_collection(self, user_id: int):
         """Get user's card collection"""
         try:
@@ -122,5 +548,170 @@ class Database:
             logger.error(f"Error getting collection for user {user_id}: {e}")
             return {}
 
-# Global database instance
-db = Database()
\ No newline at end of file
+    def _read_leaderboard(self, field: str, limit: int):
+        """Top students by ``field`` from its descending index"""
+        try:
+            students = self.students.find({}, {"name": 1, field: 1}).sort([(field, DESCENDING), ("_id", ASCENDING)]).limit(limit)
+            return [{"_id": s["_id"], "name": s.get("name"), "value": s.get(field, 0)} for s in students]
+        except Exception as e:
+            logger.error(f"Error reading {field} leaderboard: {e}")
+            return None
+
+    def get_card_stats(self, character_name: str) -> dict:
+        """Ownership and drop counters for one card"""
+        try:
+            stats = self.card_stats.find_one({"_id": character_name}) or {}
+        except Exception as e:
+            logger.error(f"Error fetching stats for {character_name}: {e}")
+            stats = {}
+        return {field: stats.get(field, 0) for field in CARD_STAT_FIELDS}
+
+    def get_global_stats(self) -> dict:
+        """Players, PPT in circulation and total cards drawn"""
+        try:
+            totals = self.meta.find_one({"_id": TOTALS_DOCUMENT_ID}) or {}
+        except Exception as e:
+            logger.error(f"Error fetching global stats: {e}")
+            totals = {}
+        return {field: totals.get(field, 0) for field in TOTAL_STAT_FIELDS}
+
+    def _apply_stat_deltas(self, cards: dict, totals: dict):
+        """Add the deltas with one bulk write for the cards and one update for the totals"""
+        if cards:
+            self.card_stats.bulk_write(
+                [UpdateOne({"_id": name}, {"$inc": deltas}, upsert=True) for name, deltas in cards.items()],
+                ordered=False
+            )
+        if totals:
+            self.meta.update_one({"_id": TOTALS_DOCUMENT_ID}, {"$inc": totals}, upsert=True)
+
+    def reconcile_stats(self) -> bool:
+        """Recount owners/stars/maxed per card and players/ppt from the students.
+
+        ``drops`` and ``spins`` can't be recovered from the collections and
+        are left as counted. Deltas other processes haven't flushed yet may
+        be counted twice until the next reconcile.
+        """
+        try:
+            self.flush_stats()
+            counts = list(self.students.aggregate([
+                {"$project": {"entries": {"$objectToArray": {"$ifNull": ["$collection", {}]}}}},
+                {"$unwind": "$entries"},
+                {"$group": {
+                    "_id": "$entries.k",
+                    "owners": {"$sum": 1},
+                    "stars": {"$sum": "$entries.v.Star"},
+                    "maxed": {"$sum": {"$cond": [{"$gte": ["$entries.v.Star", MAX_STAR]}, 1, 0]}}
+                }}
+            ]))
+            operations = [
+                UpdateOne(
+                    {"_id": count["_id"]},
+                    {"$set": {"owners": count["owners"], "stars": count["stars"], "maxed": count["maxed"]}},
+                    upsert=True
+                )
+                for count in counts
+            ]
+            if operations:
+                self.card_stats.bulk_write(operations, ordered=False)
+            self.card_stats.update_many(
+                {"_id": {"$nin": [count["_id"] for count in counts]}},
+                {"$set": {"owners": 0, "stars": 0, "maxed": 0}}
+            )
+
+            totals = list(self.students.aggregate([
+                {"$group": {"_id": None, "players": {"$sum": 1}, "ppt": {"$sum": "$ppt"}}}
+            ]))
+            players, ppt = (totals[0]["players"], totals[0]["ppt"]) if totals else (0, 0)
+            self.meta.update_one(
+                {"_id": TOTALS_DOCUMENT_ID},
+                {"$set": {"players": players, "ppt": ppt}},
+                upsert=True
+            )
+            logger.info(f"Reconciled stats for {len(counts)} cards and {players} players")
+            return True
+        except Exception as e:
+            logger.error(f"Error reconciling stats: {e}")
+            return False
+
+    def record_battle(self, battle: dict) -> bool:
+        """Store a battle log from battle.battle_record"""
+        try:
+            self.battle.insert_one(dict(battle, created_at=datetime.datetime.now(datetime.timezone.utc)))
+            return True
+        except Exception as e:
+            logger.error(f"Error recording battle: {e}")
+            return False
+
+# Time every Database call
+metrics.instrument_methods(Database, "db")
+
+def create_database(backend: str = STORAGE_BACKEND) -> Storage:
+    """Build the configured storage backend ("mongodb" or "sqlite")"""
+    if backend == "sqlite":
+        from sqlite_storage import SQLiteDatabase
+        return SQLiteDatabase(SQLITE_PATH)
+    if backend != "mongodb":
+        raise ValueError(f"Unknown storage backend: {backend!r}")
+    return Database()
+
+class AsyncDatabase:
+    """Awaitable wrapper around a storage backend.
+
+    Every backend method is exposed under the same name as a coroutine that
+    runs the blocking call on a bounded thread pool, so handlers can
+    ``await`` it without stalling the event loop. Identical concurrent
+    calls to the reads in ``COALESCED_READS`` share one backend call, so a
+    burst of the same command costs one query instead of one per message.
+    """
+    def __init__(self, database: Storage, max_workers: int = DB_MAX_WORKERS):
+        self._database = database
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self._in_flight = {}
+        self.coalesced = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._database, name)
+        if not callable(attr):
+            return attr
+
+        async def run(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            # Carry the caller's context over so its QueryCounter sees the call
+            context = contextvars.copy_context()
+            call = functools.partial(context.run, attr, *args, **kwargs)
+            return await loop.run_in_executor(self._executor, call)
+
+        if name not in COALESCED_READS:
+            method = functools.wraps(attr)(run)
+        else:
+            @functools.wraps(attr)
+            async def method(*args, **kwargs):
+                try:
+                    key = (name, args, tuple(sorted(kwargs.items())))
+                    hash(key)
+                except TypeError:
+                    return await run(*args, **kwargs)
+
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = asyncio.ensure_future(run(*args, **kwargs))
+                    self._in_flight[key] = future
+                    future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+                else:
+                    self.coalesced += 1
+                    metrics.increment("coalesced", name)
+                # A cancelled caller mustn't cancel the query for the others
+                return await asyncio.shield(future)
+
+        # Cache the coroutine wrapper so later lookups skip __getattr__
+        setattr(self, name, method)
+        return method
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=wait)
+
+# Global database instances
+db = create_database()
+adb = AsyncDatabase(db)
\ No newline at end of file
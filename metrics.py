@@ -0,0 +1,242 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+RESERVOIR_SIZE = 1024  # Recent samples kept per series for quantiles
+
+class Series:
+    """Latency histogram, error count and recent samples for one (kind, name)"""
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds: float, error: bool = False):
+        self.count += 1
+        self.total += seconds
+        if error:
+            self.errors += 1
+        self.samples.append(seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def snapshot(self) -> dict:
+        # Quantiles are taken over the most recent samples only
+        ordered = sorted(self.samples)
+        def pick(q):
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": self.errors / self.count if self.count else 0.0,
+            "mean": self.total / self.count if self.count else 0.0,
+            **{f"p{int(q * 100)}": pick(q) for q in QUANTILES}
+        }
+
+class Metrics:
+    """Registry of latency series tagged by kind (command, db, mongo, discord) and name,
+    plus plain event counters (coalesced reads, throttled and rejected commands)"""
+    def __init__(self):
+        self.started = time.time()
+        self._series = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _get(self, kind: str, name: str) -> Series:
+        key = (kind, name)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, Series())
+        return series
+
+    def observe(self, kind: str, name: str, seconds: float, error: bool = False):
+        """Record one operation"""
+        series = self._get(kind, name)
+        with self._lock:
+            series.observe(seconds, error)
+
+    def increment(self, kind: str, name: str, amount: int = 1):
+        """Count an event that has no latency of its own"""
+        with self._lock:
+            self._counters[(kind, name)] = self._counters.get((kind, name), 0) + amount
+
+    def record_error(self, kind: str, name: str):
+        """Count an error for an operation whose latency is recorded elsewhere"""
+        series = self._get(kind, name)
+        with self._lock:
+            series.errors += 1
+
+    @contextmanager
+    def timer(self, kind: str, name: str):
+        """Time the body of a with-block; exceptions are counted as errors"""
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(kind, name, time.perf_counter() - start, error)
+
+    def instrument(self, kind: str, name: str = None):
+        """Decorator that times a sync or async function"""
+        def decorator(func):
+            label = name or func.__name__
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(kind, label):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(kind, label):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def instrument_methods(self, cls, kind: str):
+        """Time every public method of ``cls``, including ones it inherits"""
+        for attr_name in dir(cls):
+            if attr_name.startswith("_"):
+                continue
+            attr = inspect.getattr_static(cls, attr_name)
+            if not inspect.isfunction(attr) or getattr(attr, "_instrumented", False):
+                continue
+            wrapper = self.instrument(kind, attr_name)(attr)
+            wrapper._instrumented = True
+            setattr(cls, attr_name, wrapper)
+        return cls
+
+    def snapshot(self) -> dict:
+        """All series as plain data, for JSON export"""
+        with self._lock:
+            series = {key: s.snapshot() for key, s in self._series.items()}
+            counters = dict(self._counters)
+        result = {"timestamp": time.time(), "uptime": time.time() - self.started}
+        for (kind, name), data in sorted(series.items()):
+            result.setdefault(kind, {})[name] = data
+        for (kind, name), count in sorted(counters.items()):
+            result.setdefault("counters", {}).setdefault(kind, {})[name] = count
+        return result
+
+    def render_prometheus(self) -> str:
+        """All series in the Prometheus text exposition format"""
+        lines = [
+            "# HELP bot_latency_seconds Latency of bot commands, database calls and Discord edits",
+            "# TYPE bot_latency_seconds histogram"
+        ]
+        with self._lock:
+            items = sorted((key, s.snapshot(), list(s.bucket_counts), s.total) for key, s in self._series.items())
+            counters = sorted(self._counters.items())
+
+        for (kind, name), data, bucket_counts, total in items:
+            labels = f'kind="{kind}",name="{_escape(name)}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, bucket_counts):
+                cumulative += count
+                lines.append(f'bot_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'bot_latency_seconds_bucket{{{labels},le="+Inf"}} {data["count"]}')
+            lines.append(f"bot_latency_seconds_sum{{{labels}}} {total}")
+            lines.append(f"bot_latency_seconds_count{{{labels}}} {data['count']}")
+
+        lines += ["# HELP bot_latency_quantile_seconds Latency quantiles over recent samples",
+                  "# TYPE bot_latency_quantile_seconds gauge"]
+        for (kind, name), data, _, _ in items:
+            for q in QUANTILES:
+                lines.append(
+                    f'bot_latency_quantile_seconds{{kind="{kind}",name="{_escape(name)}",quantile="{q}"}} '
+                    f'{data[f"p{int(q * 100)}"]}'
+                )
+
+        lines += ["# HELP bot_errors_total Failed operations", "# TYPE bot_errors_total counter"]
+        for (kind, name), data, _, _ in items:
+            lines.append(f'bot_errors_total{{kind="{kind}",name="{_escape(name)}"}} {data["errors"]}')
+
+        lines += ["# HELP bot_events_total Coalesced reads, throttled and rejected commands",
+                  "# TYPE bot_events_total counter"]
+        for (kind, name), count in counters:
+            lines.append(f'bot_events_total{{kind="{kind}",name="{_escape(name)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    async def _handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Drain the headers; the request body (if any) is ignored
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                pass
+
+            parts = request_line.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else "/"
+            if path.startswith("/metrics.json"):
+                status, content_type, body = "200 OK", "application/json", json.dumps(self.snapshot())
+            elif path.startswith("/metrics"):
+                status, content_type, body = "200 OK", "text/plain; version=0.0.4", self.render_prometheus()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", "not found\n"
+
+            payload = body.encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    async def start_server(self, host: str, port: int):
+        """Serve /metrics (Prometheus text) and /metrics.json on a local port"""
+        try:
+            self._server = await asyncio.start_server(self._handle_request, host, port)
+            logger.info(f"Metrics available at http://{host}:{port}/metrics")
+        except OSError as e:
+            logger.error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+
+    def write_snapshot(self, path: str):
+        """Write the current snapshot as JSON, atomically replacing ``path``"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(temp_path, path)
+
+    async def write_snapshots(self, path: str, interval: float):
+        """Write a JSON snapshot every ``interval`` seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.write_snapshot, path)
+            except Exception as e:
+                logger.error(f"Error writing metrics snapshot to {path}: {e}")
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Global metrics registry
+metrics = Metrics()
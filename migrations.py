@@ -0,0 +1,175 @@
+import datetime
+import logging
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from catalog import LEGACY_RARITIES
+from storage import is_legacy_entry, compact_collection_entry
+from config import TEMP_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_DOCUMENT_ID = "schema"
+MIGRATION_BATCH_SIZE = 500  # Documents rewritten per bulk write
+
+# Indexes each collection needs, as (keys, options). create_index is a no-op
+# for indexes that already exist, so these are safe to apply on every start.
+INDEXES = {
+    "cards": [
+        ([("character_name", ASCENDING)], {"name": "character_name_unique", "unique": True})
+    ],
+    # One descending index per leaderboard; _id breaks ties
+    "students": [
+        ([("ppt", DESCENDING), ("_id", ASCENDING)], {"name": "ppt_leaderboard"}),
+        ([("ftps", DESCENDING), ("_id", ASCENDING)], {"name": "ftps_leaderboard"}),
+        ([("collection_count", DESCENDING), ("_id", ASCENDING)], {"name": "collection_count_leaderboard"})
+    ],
+    "battle": [
+        ([("players", ASCENDING), ("created_at", DESCENDING)], {"name": "players_created_at"})
+    ],
+    "temp": [
+        ([("created_at", ASCENDING)], {"name": "created_at_ttl", "expireAfterSeconds": TEMP_TTL_SECONDS})
+    ]
+}
+
+def store_card_rarities(database):
+    """Store the legacy config rarity on cards that don't have character_rarity yet"""
+    names_by_rarity = {}
+    for character_name, rarity in LEGACY_RARITIES.items():
+        names_by_rarity.setdefault(rarity, []).append(character_name)
+
+    for rarity, names in names_by_rarity.items():
+        database.cards.update_many(
+            {"character_name": {"$in": names}, "character_rarity": {"$exists": False}},
+            {"$set": {"character_rarity": rarity}}
+        )
+
+def backfill_collection_counts(database):
+    """Set collection_count on student documents created before it was maintained"""
+    database.students.update_many(
+        {"collection_count": {"$exists": False}},
+        [{"$set": {"collection_count": {"$size": {"$objectToArray": {"$ifNull": ["$collection", {}]}}}}}]
+    )
+
+def build_stats(database):
+    """Fill the card and global stat counters from the existing student data"""
+    if not database.reconcile_stats():
+        raise RuntimeError("stat reconcile failed")
+
+def compact_collection_entries(database):
+    """Rewrite full-copy collection entries as compact ``{id, Star, overrides}`` entries"""
+    cards = {card["character_name"]: card for card in database.cards.find({})}
+    operations = []
+    converted = 0
+    for student in database.students.find({"collection": {"$exists": True}}, {"collection": 1}):
+        updates = {}
+        for character_name, entry in (student.get("collection") or {}).items():
+            if is_legacy_entry(entry):
+                updates[f"collection.{character_name}"] = compact_collection_entry(entry, cards.get(character_name))
+        if not updates:
+            continue
+        converted += len(updates)
+        operations.append(UpdateOne({"_id": student["_id"]}, {"$set": updates}))
+        if len(operations) >= MIGRATION_BATCH_SIZE:
+            database.students.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        database.students.bulk_write(operations, ordered=False)
+    logger.info(f"Compacted {converted} collection entries")
+
+# Versioned data migrations as (version, name, function, versions it requires),
+# applied in order. Each one must be idempotent: a crash after it runs but
+# before its version is recorded reruns it. A failed migration only holds
+# back the ones that require it.
+MIGRATIONS = [
+    (1, "store card rarity on cards", store_card_rarities, ()),
+    (2, "backfill collection_count", backfill_collection_counts, ()),
+    (3, "build card and global stats", build_stats, ()),
+    (4, "compact collection entries", compact_collection_entries, ())
+]
+
+def ensure_indexes(database):
+    """Create any missing indexes from INDEXES"""
+    for collection_name, indexes in INDEXES.items():
+        collection = getattr(database, collection_name)
+        for keys, options in indexes:
+            try:
+                collection.create_index(keys, **options)
+            except Exception as e:
+                logger.error(f"Error creating index {options.get('name', keys)} on {collection_name}: {e}")
+
+def get_applied_migrations(database) -> set:
+    """Versions of every migration recorded as applied"""
+    schema = database.meta.find_one({"_id": SCHEMA_DOCUMENT_ID})
+    if not schema:
+        return set()
+    applied = {entry["version"] for entry in schema.get("applied", [])}
+    # Migrations used to run strictly in order, so everything up to version is applied
+    applied.update(range(1, schema.get("version", 0) + 1))
+    return applied
+
+def _contiguous_version(applied: set) -> int:
+    version = 0
+    while version + 1 in applied:
+        version += 1
+    return version
+
+def get_schema_version(database) -> int:
+    """The highest version up to which every migration has been applied"""
+    return _contiguous_version(get_applied_migrations(database))
+
+def run_migrations(database) -> int:
+    """Ensure indexes and apply pending migrations; returns the schema version.
+
+    A failing migration is skipped along with the migrations that require
+    it, so they never run against data in an unexpected shape; independent
+    ones still run and it is retried on the next start.
+    """
+    ensure_indexes(database)
+
+    applied = get_applied_migrations(database)
+    for migration_version, name, migrate, requires in MIGRATIONS:
+        if migration_version in applied:
+            continue
+        blocked = [version for version in requires if version not in applied]
+        if blocked:
+            logger.error(f"Skipping migration {migration_version} ({name}): needs migrations {blocked}")
+            continue
+
+        logger.info(f"Applying migration {migration_version}: {name}")
+        try:
+            migrate(database)
+        except Exception as e:
+            logger.error(f"Migration {migration_version} ({name}) failed: {e}")
+            continue
+
+        applied.add(migration_version)
+        database.meta.update_one(
+            {"_id": SCHEMA_DOCUMENT_ID},
+            {
+                "$max": {"version": _contiguous_version(applied)},
+                "$push": {"applied": {
+                    "version": migration_version,
+                    "name": name,
+                    "applied_at": datetime.datetime.now(datetime.timezone.utc)
+                }}
+            },
+            upsert=True
+        )
+
+    return _contiguous_version(applied)
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    from database import Database
+    database = Database()
+    try:
+        before = get_schema_version(database)
+        after = run_migrations(database)
+    finally:
+        database.close()
+
+    latest = MIGRATIONS[-1][0] if MIGRATIONS else 0
+    print(f"Schema version {before} -> {after} (latest {latest})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from config import (
+    RENDER_IMAGES, RENDER_CACHE_DIR, RENDER_CACHE_SIZE, RENDER_WORKERS, RENDER_ART_TIMEOUT
+)
+from catalog import catalog
+from metrics import metrics
+from storage import derive_card_stats, MAX_STAR
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout or the cached formats change so cached images are re-rendered
+RENDER_VERSION = 2
+
+CARD_SIZE = (300, 420)
+ART_HEIGHT = 250
+GRID_COLUMNS = 6
+GRID_TILE_SIZE = (150, 210)
+GRID_GAP = 8
+
+RARITY_COLORS = {
+    "rare": (212, 175, 55),
+    "uncommon": (72, 133, 237),
+    "common": (150, 150, 150)
+}
+STAT_LABELS = [("Resolve", "RES"), ("Mental", "MEN"), ("Physical", "PHY"), ("Social", "SOC"), ("Initiative", "INI")]
+
+# Rendering runs in worker processes; these functions only take and
+# return plain data so they can be pickled across.
+
+def _font(size: int):
+    try:
+        return ImageFont.truetype("DejaVuSans-Bold.ttf", size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:
+            return ImageFont.load_default()
+
+def _fit_art(art: bytes, size: tuple):
+    """Scale and center-crop the art to fill ``size``, or None if it can't be decoded"""
+    try:
+        image = Image.open(io.BytesIO(art)).convert("RGB")
+    except Exception:
+        return None
+    scale = max(size[0] / image.width, size[1] / image.height)
+    image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+    left = (image.width - size[0]) // 2
+    top = (image.height - size[1]) // 2
+    return image.crop((left, top, left + size[0], top + size[1]))
+
+def encode_png(data: bytes):
+    """Re-encode image bytes as PNG, or None if they can't be decoded"""
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception:
+        return None
+    output = io.BytesIO()
+    image.save(output, "PNG")
+    return output.getvalue()
+
+def render_card_png(spec: dict) -> bytes:
+    """Draw one card: art, name, star row, rarity badge and stats"""
+    width, height = CARD_SIZE
+    color = tuple(RARITY_COLORS.get(spec["rarity"], RARITY_COLORS["common"]))
+    card = Image.new("RGB", CARD_SIZE, (24, 26, 33))
+    draw = ImageDraw.Draw(card)
+
+    art = _fit_art(spec["art"], (width - 16, ART_HEIGHT)) if spec.get("art") else None
+    if art is not None:
+        card.paste(art, (8, 8))
+    else:
+        draw.rectangle((8, 8, width - 8, 8 + ART_HEIGHT), fill=(48, 52, 64))
+    draw.rectangle((0, 0, width - 1, height - 1), outline=color, width=4)
+
+    # Rarity badge in the top-right corner of the art
+    draw.ellipse((width - 52, 16, width - 16, 52), fill=color, outline=(255, 255, 255), width=2)
+    draw.text((width - 34, 34), spec["rarity"][:1].upper(), font=_font(18), fill=(0, 0, 0), anchor="mm")
+
+    y = ART_HEIGHT + 16
+    name, name_font = spec["name"], _font(20)
+    while len(name) > 1 and draw.textlength(name, font=name_font) > width - 28:
+        name = name[:-2] + "…"
+    draw.text((14, y), name, font=name_font, fill=(255, 255, 255))
+    y += 28
+    draw.text((14, y), "★" * spec["star"] + "☆" * (spec["max_star"] - spec["star"]), font=_font(18), fill=color)
+    y += 30
+
+    stat_font = _font(15)
+    for i, (field, label) in enumerate(STAT_LABELS):
+        column, row = i % 3, i // 3
+        draw.text((14 + column * 95, y + row * 24), f"{label} {spec['stats'][field]}", font=stat_font, fill=(220, 220, 220))
+
+    output = io.BytesIO()
+    card.save(output, "PNG", optimize=True)
+    return output.getvalue()
+
+def render_grid_png(tiles: list, columns: int = GRID_COLUMNS) -> bytes:
+    """Lay out card images in a grid, scaled down to GRID_TILE_SIZE"""
+    columns = max(1, min(columns, len(tiles)))
+    rows = (len(tiles) + columns - 1) // columns
+    tile_width, tile_height = GRID_TILE_SIZE
+    grid = Image.new(
+        "RGB",
+        (columns * tile_width + (columns + 1) * GRID_GAP, rows * tile_height + (rows + 1) * GRID_GAP),
+        (16, 17, 22)
+    )
+    for i, tile in enumerate(tiles):
+        image = Image.open(io.BytesIO(tile)).convert("RGB").resize(GRID_TILE_SIZE)
+        column, row = i % columns, i // columns
+        grid.paste(image, (GRID_GAP + column * (tile_width + GRID_GAP), GRID_GAP + row * (tile_height + GRID_GAP)))
+
+    output = io.BytesIO()
+    grid.save(output, "PNG", optimize=True)
+    return output.getvalue()
+
+def content_key(*parts) -> str:
+    """Stable hash of the inputs that determine an image"""
+    data = json.dumps([RENDER_VERSION, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+class RenderCache:
+    """Content-addressed image cache: an in-memory LRU in front of a directory of PNGs.
+
+    Keys are hashes of everything that went into an image, so entries
+    never need invalidating; a changed card simply hashes to a new key.
+    """
+    def __init__(self, directory: str = RENDER_CACHE_DIR, maxsize: int = RENDER_CACHE_SIZE):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def get(self, key: str):
+        """Cached image bytes, or None"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        if not self.directory:
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._remember(key, data)
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def set(self, key: str, data: bytes, persist: bool = True):
+        """Store image bytes in memory, and on disk unless ``persist`` is false"""
+        self._remember(key, data)
+        if not self.directory or not persist:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write render cache entry {key}: {e}")
+
+    def _remember(self, key: str, data: bytes):
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+class CardRenderer:
+    """Renders card images and spin grids off the event loop, with caching.
+
+    Card art is downloaded once and kept in the cache under the hash of
+    its URL. Drawing happens in a process pool, and concurrent requests
+    for the same image share one render.
+    """
+    def __init__(self, cache: RenderCache = None, max_workers: int = RENDER_WORKERS, enabled: bool = RENDER_IMAGES):
+        self.cache = cache or RenderCache()
+        self.max_workers = max_workers
+        self.enabled = enabled and Image is not None
+        self._executor = None
+        self._in_flight = {}
+
+    @property
+    def available(self) -> bool:
+        return self.enabled
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned workers don't inherit the bot's threads and sockets
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _single_flight(self, key: str, produce):
+        """Return the cached image for ``key``, producing it once however many callers wait"""
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(produce())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _art(self, url: str):
+        """Card art bytes, downloaded once; None if it can't be fetched"""
+        if not url:
+            return None
+        key = content_key("art", url)
+
+        async def download():
+            import aiohttp
+            try:
+                with metrics.timer("render", "fetch_art"):
+                    # Art is fetched once per card and then served from the cache,
+                    # so a short-lived session is cheaper than keeping one open
+                    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=RENDER_ART_TIMEOUT)) as session:
+                        async with session.get(url) as response:
+                            response.raise_for_status()
+                            data = await response.read()
+            except Exception as e:
+                logger.warning(f"Could not fetch card art {url}: {e}")
+                return None
+            # Art comes in whatever format the host serves; store it as PNG like everything else
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(self._pool(), encode_png, data)
+            if data is None:
+                logger.warning(f"Could not decode card art {url}")
+                return None
+            self.cache.set(key, data)
+            return data
+
+        return await self._single_flight(key, download)
+
+    async def card_image(self, card: dict, entry: dict = None) -> bytes:
+        """PNG of ``card`` at the entry's star level"""
+        stats = derive_card_stats(card, entry)
+        url = card.get("character_url_image", "")
+        spec = {
+            "name": card["character_name"],
+            "rarity": catalog.get_rarity(card["character_name"]),
+            "star": stats["Star"],
+            "max_star": MAX_STAR,
+            "stats": {field: stats[field] for field, _ in STAT_LABELS}
+        }
+        key = content_key("card", spec, url)
+
+        async def render():
+            spec["art"] = await self._art(url)
+            loop = asyncio.get_running_loop()
+            with metrics.timer("render", "card"):
+                data = await loop.run_in_executor(self._pool(), render_card_png, spec)
+            # Don't keep a placeholder under the key of the finished card;
+            # the art download is retried next time
+            if spec["art"] is not None or not url:
+                self.cache.set(key, data)
+            return data
+
+        return await self._single_flight(key, render)
+
+    async def spin_grid(self, cards: list) -> bytes:
+        """One PNG showing every ``(card, entry)`` of a spin in a grid"""
+        tiles = await asyncio.gather(*(self.card_image(card, entry) for card, entry in cards))
+        key = content_key("grid", [hashlib.sha256(tile).hexdigest() for tile in tiles])
+
+        async def render():
+            loop = asyncio.get_running_loop()
+            with metrics.timer("render", "grid"):
+                data = await loop.run_in_executor(self._pool(), render_grid_png, list(tiles))
+            # Spins rarely repeat exactly, so grids are kept in memory only;
+            # on disk the cache stays bounded by cards times star levels
+            self.cache.set(key, data, persist=False)
+            return data
+
+        return await self._single_flight(key, render)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Global renderer
+renderer = CardRenderer()
@@ -0,0 +1,169 @@
+import argparse
+import random
+import time
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class AliasSampler:
+    """Weighted sampler using Vose's alias method.
+
+    Building the tables is O(n); every draw afterwards is O(1) and takes a
+    single random number, no matter how many items there are or how fine
+    the weights are.
+    """
+    def __init__(self, items, weights, seed=None):
+        self.items = list(items)
+        weights = [float(w) for w in weights]
+
+        if not self.items:
+            raise ValueError("Cannot build a sampler with no items")
+        if len(weights) != len(self.items):
+            raise ValueError("Each item needs exactly one weight")
+        if any(w < 0 for w in weights):
+            raise ValueError("Weights must not be negative")
+
+        total = sum(weights)
+        if total <= 0:
+            raise ValueError("At least one weight must be positive")
+
+        self.weights = weights
+        self.random = random.Random(seed)
+        self.prob, self.alias = self._build_tables([w / total for w in weights])
+
+    @staticmethod
+    def _build_tables(probabilities: list):
+        """Build the probability and alias tables"""
+        n = len(probabilities)
+        prob = [0.0] * n
+        alias = list(range(n))
+        scaled = [p * n for p in probabilities]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+
+        # Whatever is left over is 1.0 up to floating point error
+        for i in large + small:
+            prob[i] = 1.0
+        return prob, alias
+
+    def seed(self, seed=None):
+        """Reseed the sampler's random generator"""
+        self.random.seed(seed)
+
+    def probabilities(self) -> dict:
+        """Exact probability of drawing each item"""
+        total = sum(self.weights)
+        probabilities = {}
+        for item, weight in zip(self.items, self.weights):
+            probabilities[item] = probabilities.get(item, 0.0) + weight / total
+        return probabilities
+
+    def _draw_indices(self, count: int) -> list:
+        n = len(self.items)
+        prob = self.prob
+        alias = self.alias
+        rand = self.random.random
+        indices = []
+        append = indices.append
+        for _ in range(count):
+            # One uniform number picks the column and decides the coin flip
+            x = rand() * n
+            i = int(x)
+            append(i if x - i < prob[i] else alias[i])
+        return indices
+
+    def draw(self):
+        """Draw a single item"""
+        return self.items[self._draw_indices(1)[0]]
+
+    def draw_many(self, count: int) -> list:
+        """Draw ``count`` items in one call"""
+        items = self.items
+        return [items[i] for i in self._draw_indices(count)]
+
+    def simulate(self, count: int, chunk_size: int = 1_000_000) -> Counter:
+        """Draw ``count`` items and return how often each one came up.
+
+        Uses NumPy when it is installed; the generator is seeded from the
+        sampler's own RNG so a seeded sampler gives reproducible results.
+        """
+        counts = Counter()
+        if np is None:
+            remaining = count
+            while remaining > 0:
+                batch = min(chunk_size, remaining)
+                counts.update(self._draw_indices(batch))
+                remaining -= batch
+        else:
+            rng = np.random.default_rng(self.random.getrandbits(64))
+            n = len(self.items)
+            prob = np.asarray(self.prob)
+            alias = np.asarray(self.alias)
+            totals = np.zeros(n, dtype=np.int64)
+            remaining = count
+            while remaining > 0:
+                batch = min(chunk_size, remaining)
+                x = rng.random(batch) * n
+                columns = x.astype(np.int64)
+                picks = np.where(x - columns < prob[columns], columns, alias[columns])
+                totals += np.bincount(picks, minlength=n)
+                remaining -= batch
+            counts.update({i: int(c) for i, c in enumerate(totals) if c})
+
+        results = Counter()
+        for i, c in counts.items():
+            results[self.items[i]] += c
+        return results
+
+def build_spin_sampler(characters_by_rarity: dict, rarity_weights: dict, seed=None) -> AliasSampler:
+    """Build a sampler over every character, weighted by its rarity"""
+    names = []
+    weights = []
+    for rarity, characters in characters_by_rarity.items():
+        for character_name in characters:
+            names.append(character_name)
+            weights.append(rarity_weights.get(rarity, 0.0))
+    return AliasSampler(names, weights, seed)
+
+def default_spin_sampler(seed=None) -> AliasSampler:
+    """Sampler for the configured character pool"""
+    from config import RARE_CHARACTERS, UNCOMMON_CHARACTERS, COMMON_CHARACTERS, RARITY_WEIGHTS
+    return build_spin_sampler(
+        {"rare": RARE_CHARACTERS, "uncommon": UNCOMMON_CHARACTERS, "common": COMMON_CHARACTERS},
+        RARITY_WEIGHTS,
+        seed
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate spins and compare observed drop rates to the configured ones")
+    parser.add_argument("--draws", type=int, default=1_000_000, help="number of spins to simulate")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a reproducible run")
+    args = parser.parse_args()
+
+    sampler = default_spin_sampler(args.seed)
+    start = time.perf_counter()
+    counts = sampler.simulate(args.draws)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.draws:,} draws in {elapsed:.2f}s ({args.draws / elapsed:,.0f} draws/sec)")
+    print(f"{'Character':<24}{'Expected':>10}{'Observed':>10}")
+    for name, expected in sorted(sampler.probabilities().items(), key=lambda item: -item[1]):
+        observed = counts[name] / args.draws
+        print(f"{name:<24}{expected:>10.4%}{observed:>10.4%}")
+
+if __name__ == "__main__":
+    main()
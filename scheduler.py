@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from config import MESSAGE_EDIT_RATE, MESSAGE_EDIT_PER
+from metrics import metrics
+from throttle import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+class MessageUpdateScheduler:
+    """Sends message edits in the background, merging and pacing them.
+
+    Each ``submit`` replaces any edit still waiting for the same message,
+    so only the latest state goes out. Edits are paced per rate-limit
+    bucket so bursts never run into Discord's 429s, and callers never wait
+    on the network unless they ask to with ``flush``.
+    """
+    def __init__(self, rate: int = MESSAGE_EDIT_RATE, per: float = MESSAGE_EDIT_PER):
+        self.rate = rate
+        self.per = per
+        self.sent = 0
+        self.merged = 0
+        self._pending = {}
+        self._waiters = {}
+        self._in_flight = set()
+        self._buckets = {}
+        self._wakeup = None
+        self._task = None
+
+    def submit(self, key, edit, bucket=None) -> asyncio.Future:
+        """Queue ``edit`` as the latest update for the message identified by ``key``.
+
+        ``edit`` is a zero-argument callable returning an awaitable; it is
+        only called when the edit is actually sent, so it always sees the
+        newest state. ``bucket`` names the rate-limit bucket, which should
+        match the scope Discord limits the edit's route by (see
+        ``interaction_bucket``); it defaults to ``key``. Returns a future that resolves once this or a newer edit
+        for ``key`` has been sent.
+        """
+        self._ensure_running()
+        if key in self._pending:
+            self.merged += 1
+        self._pending[key] = (bucket if bucket is not None else key, edit)
+
+        waiter = self._waiters.get(key)
+        if waiter is None or waiter.done():
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[key] = waiter
+        self._wakeup.set()
+        return waiter
+
+    async def flush(self, key):
+        """Wait until the latest queued edit for ``key`` has been sent"""
+        waiter = self._waiters.get(key)
+        if waiter is not None:
+            await asyncio.shield(waiter)
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _bucket(self, name) -> TokenBucket:
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = TokenBucket(self.rate, self.per)
+        return bucket
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            delay = None
+            for key, (bucket_name, edit) in list(self._pending.items()):
+                # One edit per message at a time keeps them in order
+                if key in self._in_flight:
+                    continue
+                bucket = self._bucket(bucket_name)
+                if not bucket.try_take():
+                    wait = bucket.wait_time()
+                    delay = wait if delay is None else min(delay, wait)
+                    continue
+                del self._pending[key]
+                self._in_flight.add(key)
+                asyncio.get_running_loop().create_task(self._send(key, edit))
+
+            if delay is not None:
+                asyncio.get_running_loop().call_later(delay, self._wakeup.set)
+
+            # Forget idle buckets that have fully refilled
+            for name in [n for n, b in self._buckets.items() if b.full()]:
+                del self._buckets[name]
+
+    async def _send(self, key, edit):
+        waiter = self._waiters.get(key)
+        try:
+            with metrics.timer("discord", "edit_message"):
+                await edit()
+            self.sent += 1
+        except Exception as e:
+            logger.error(f"Error sending message update {key}: {e}")
+        finally:
+            self._in_flight.discard(key)
+            if key in self._pending:
+                # A newer edit arrived while this one was sending
+                self._wakeup.set()
+            else:
+                self._waiters.pop(key, None)
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "merged": self.merged, "pending": len(self._pending)}
+
+def interaction_bucket(interaction) -> tuple:
+    """Rate-limit bucket for ``interaction.edit_original_response``.
+
+    Discord limits that webhook route per interaction token, not per
+    message, so this is what edits through the interaction must be paced by.
+    """
+    return ("webhook", interaction.token)
+
+# Global scheduler shared by every view
+update_scheduler = MessageUpdateScheduler()
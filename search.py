@@ -0,0 +1,176 @@
+import bisect
+import re
+import unicodedata
+from collections import Counter
+
+# Score for each kind of match; higher ranks first
+EXACT_SCORE = 100
+NAME_PREFIX_SCORE = 90
+WORD_PREFIX_SCORE = 80
+SUBSTRING_SCORE = 70
+TAG_SCORE = 60
+FUZZY_SCORE = 50
+
+MIN_SIMILARITY = 0.3
+MAX_QUERY_LENGTH = 64
+
+_WORD_SPLIT = re.compile(r"[^\w]+")
+
+def normalize(text: str) -> str:
+    """Lower-case text and strip accents, so "Kiryūin" matches "kiryuin" """
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+def tokenize(text: str) -> list:
+    """Split normalized text into words"""
+    return [word for word in _WORD_SPLIT.split(normalize(text)) if word]
+
+def trigrams(word: str) -> set:
+    """Character trigrams of a word, padded so prefixes and suffixes count"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_typos(word: str) -> int:
+    """How many edits a query word of this length may contain"""
+    if len(word) < 4:
+        return 0
+    if len(word) < 8:
+        return 1
+    return 2
+
+def within_distance(a: str, b: str, limit: int) -> bool:
+    """True if the Levenshtein distance between ``a`` and ``b`` is at most ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+def _tag_words(card: dict) -> list:
+    tags = card.get("character_tags", "")
+    if isinstance(tags, (list, tuple)):
+        tags = " ".join(str(tag) for tag in tags)
+    return tokenize(tags)
+
+class CardSearchIndex:
+    """Prefix and trigram index over card names and tags.
+
+    Lookups only touch the cards that share a word prefix or trigram with
+    the query, so search cost stays flat as the catalog grows.
+    """
+    def __init__(self, cards=()):
+        self.cards = {}
+        self.names = {}
+        self.name_words = {}
+        self.tag_words = {}
+        self.prefixes = []
+        self.grams = {}
+
+        for card in cards:
+            self._add(card)
+        self.prefixes.sort()
+
+    def _add(self, card: dict):
+        key = card["character_name"]
+        self.cards[key] = card
+        self.names[key] = normalize(key)
+        self.name_words[key] = tokenize(key)
+        self.tag_words[key] = _tag_words(card)
+
+        for word in set(self.name_words[key]) | set(self.tag_words[key]):
+            self.prefixes.append((word, key))
+            for gram in trigrams(word):
+                self.grams.setdefault(gram, set()).add(key)
+
+    def _prefix_matches(self, word: str) -> set:
+        """Keys of cards with a name or tag word starting with ``word``"""
+        matches = set()
+        i = bisect.bisect_left(self.prefixes, (word, ""))
+        while i < len(self.prefixes) and self.prefixes[i][0].startswith(word):
+            matches.add(self.prefixes[i][1])
+            i += 1
+        return matches
+
+    def _gram_matches(self, words: list) -> Counter:
+        """How many query trigrams each card shares"""
+        shared = Counter()
+        for word in words:
+            for gram in trigrams(word):
+                shared.update(self.grams.get(gram, ()))
+        return shared
+
+    def _score(self, key: str, query: str, words: list) -> float:
+        name = self.names[key]
+        name_words = self.name_words[key]
+        if name == query:
+            return EXACT_SCORE
+        if name.startswith(query):
+            return NAME_PREFIX_SCORE
+        if all(any(w.startswith(q) for w in name_words) for q in words):
+            return WORD_PREFIX_SCORE
+        if query in name:
+            return SUBSTRING_SCORE
+
+        all_words = name_words + self.tag_words[key]
+        if all(any(w.startswith(q) for w in all_words) for q in words):
+            return TAG_SCORE
+
+        # Typo tolerance: every query word must be close to some word on the card
+        typo_matched = all(
+            any(within_distance(q, w[:len(q) + max_typos(q)], max_typos(q)) for w in all_words)
+            for q in words
+        )
+        query_grams = set().union(*(trigrams(q) for q in words))
+        card_grams = set().union(*(trigrams(w) for w in all_words)) if all_words else set()
+        similarity = 2 * len(query_grams & card_grams) / (len(query_grams) + len(card_grams) or 1)
+
+        if typo_matched:
+            return FUZZY_SCORE + similarity * 10
+        if similarity >= MIN_SIMILARITY:
+            return FUZZY_SCORE * similarity
+        return 0
+
+    def search(self, search_term: str, limit: int = None) -> list:
+        """Cards matching ``search_term``, best match first"""
+        query = normalize(search_term[:MAX_QUERY_LENGTH])
+        words = tokenize(query)
+        if not words:
+            return []
+
+        candidates = set()
+        for word in words:
+            candidates |= self._prefix_matches(word)
+
+        # Only cards sharing a fair share of the query's trigrams are worth scoring
+        gram_count = sum(len(trigrams(word)) for word in words)
+        for key, shared in self._gram_matches(words).items():
+            if shared >= gram_count * MIN_SIMILARITY:
+                candidates.add(key)
+
+        scored = []
+        for key in candidates:
+            score = self._score(key, query, words)
+            if score > 0:
+                scored.append((-score, self.names[key], key))
+        scored.sort()
+
+        # Fuzzy matches only fill the slots the exact and prefix stages left, and
+        # once those found anything, trigram similarity without a typo match isn't enough
+        strong = sum(1 for score, _, _ in scored if -score >= TAG_SCORE)
+        if strong:
+            floor = TAG_SCORE if limit is None or strong >= limit else FUZZY_SCORE
+            scored = [item for item in scored if -item[0] >= floor]
+
+        if limit is not None:
+            scored = scored[:limit]
+        return [self.cards[key] for _, _, key in scored]
+
+    def __len__(self):
+        return len(self.cards)
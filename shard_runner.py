@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+import urllib.request
+from config import (
+    DISCORD_TOKEN, SHARD_COUNT, SHARD_PROCESSES, CATALOG_SNAPSHOT_PATH,
+    METRICS_HOST, METRICS_PORT, METRICS_SNAPSHOT_PATH,
+    MONGODB_MAX_POOL_SIZE, MONGODB_MIN_POOL_SIZE,
+    SHARD_STATUS_PATH, SHARD_HEALTH_INTERVAL, SHARD_HEALTH_FAILURES, SHARD_RESTART_BACKOFF_MAX
+)
+
+logger = logging.getLogger(__name__)
+
+GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+IDENTIFY_INTERVAL = 5.0  # Seconds Discord requires between identifies per concurrency slot
+STABLE_AFTER = 60  # A worker that ran this long before exiting restarts without backoff
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py")
+DEFAULT_SNAPSHOT_PATH = "catalog_snapshot.json"
+
+def fetch_gateway_info(token: str) -> dict:
+    """Ask Discord for the recommended shard count and identify concurrency"""
+    request = urllib.request.Request(GATEWAY_URL, headers={
+        "Authorization": f"Bot {token}",
+        "User-Agent": "DiscordBot (faction-of-the-elite, 1.0)"
+    })
+    with urllib.request.urlopen(request, timeout=10) as response:
+        data = json.load(response)
+    return {
+        "shards": data["shards"],
+        "max_concurrency": data.get("session_start_limit", {}).get("max_concurrency", 1)
+    }
+
+def split_shards(shard_count: int, processes: int) -> list:
+    """Spread shard ids over ``processes`` contiguous, near-equal ranges"""
+    processes = max(1, min(processes, shard_count))
+    base, extra = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+    for i in range(processes):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+async def fetch_health(host: str, port: int, timeout: float = 5.0):
+    """GET a worker's /metrics.json; returns the parsed snapshot or None"""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        try:
+            writer.write(f"GET /metrics.json HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), timeout)
+        finally:
+            writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        if not head.startswith(b"HTTP/1.1 200"):
+            return None
+        return json.loads(body)
+    except Exception as e:
+        logger.debug(f"Health check of {host}:{port} failed: {e}")
+        return None
+
+class Worker:
+    """One bot process running a range of shards"""
+    def __init__(self, index: int, shard_ids: list, shard_count: int, env: dict):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.env = env
+        self.process = None
+        self.started_at = None
+        self.restarts = 0
+        self.backoff = 1.0
+        self.health_failures = 0
+        self.last_health = None
+
+    @property
+    def metrics_port(self):
+        return self.env.get("METRICS_PORT")
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(sys.executable, BOT_SCRIPT, env=self.env)
+        self.started_at = time.monotonic()
+        self.health_failures = 0
+        logger.info(f"Worker {self.index} (shards {self.shard_ids}) started as pid {self.process.pid}")
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def stop(self, timeout: float = 10.0):
+        """Ask the worker to exit, killing it if it doesn't within ``timeout``"""
+        if not self.alive():
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Worker {self.index} did not exit, killing it")
+            self.process.kill()
+            await self.process.wait()
+
+    def status(self) -> dict:
+        return {
+            "index": self.index,
+            "shards": self.shard_ids,
+            "pid": self.process.pid if self.process else None,
+            "alive": self.alive(),
+            "uptime": time.monotonic() - self.started_at if self.alive() else 0.0,
+            "restarts": self.restarts,
+            "health_failures": self.health_failures,
+            "metrics_port": self.metrics_port,
+            "commands": sum(s["count"] for s in (self.last_health or {}).get("command", {}).values())
+        }
+
+class Supervisor:
+    """Runs shard workers, restarting them when they exit or stop answering health checks.
+
+    Before any worker starts the supervisor runs the migrations once and
+    writes the card catalog to a snapshot file, so workers neither race
+    each other migrating nor all read the whole cards collection at boot.
+    """
+    def __init__(self, shard_count: int, processes: int, max_concurrency: int = 1,
+                 snapshot_path: str = DEFAULT_SNAPSHOT_PATH, status_path: str = SHARD_STATUS_PATH):
+        self.shard_count = shard_count
+        self.max_concurrency = max(1, max_concurrency)
+        self.snapshot_path = snapshot_path
+        self.status_path = status_path
+        self.stopping = False
+        self.workers = [
+            Worker(index, shard_ids, shard_count, self._worker_env(index, shard_ids, processes))
+            for index, shard_ids in enumerate(split_shards(shard_count, processes))
+        ]
+
+    def _worker_env(self, index: int, shard_ids: list, processes: int) -> dict:
+        env = dict(os.environ)
+        env.update({
+            "SHARD_COUNT": str(self.shard_count),
+            "SHARD_IDS": ",".join(str(shard_id) for shard_id in shard_ids),
+            "CATALOG_SNAPSHOT_PATH": self.snapshot_path,
+            # Each worker has its own pool; split the configured budget between them
+            "MONGODB_MAX_POOL_SIZE": str(max(MONGODB_MIN_POOL_SIZE, MONGODB_MAX_POOL_SIZE // processes)),
+            "METRICS_PORT": str(METRICS_PORT + 1 + index) if METRICS_PORT else "0"
+        })
+        if METRICS_SNAPSHOT_PATH:
+            root, ext = os.path.splitext(METRICS_SNAPSHOT_PATH)
+            env["METRICS_SNAPSHOT_PATH"] = f"{root}.worker{index}{ext}"
+        return env
+
+    def prepare(self) -> bool:
+        """Migrate the database and write the catalog snapshot for the workers"""
+        from database import create_database
+        database = create_database()
+        try:
+            if not database.warm_up():
+                return False
+            count = database.catalog.save_snapshot(self.snapshot_path)
+            logger.info(f"Wrote {count} cards to {self.snapshot_path}")
+            return True
+        finally:
+            database.close()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except NotImplementedError:
+                pass
+
+        watchers = []
+        for worker in self.workers:
+            if self.stopping:
+                break
+            await worker.start()
+            watchers.append(asyncio.create_task(self._watch(worker)))
+            # Stagger identifies so workers don't trip the gateway's session start limit
+            await asyncio.sleep(len(worker.shard_ids) * IDENTIFY_INTERVAL / self.max_concurrency)
+
+        health_task = asyncio.create_task(self._health_loop())
+        await asyncio.gather(*watchers)
+        health_task.cancel()
+        self.write_status()
+
+    def request_stop(self):
+        logger.info("Stopping shard workers")
+        self.stopping = True
+        for worker in self.workers:
+            if worker.alive():
+                worker.process.terminate()
+
+    async def _watch(self, worker: Worker):
+        """Wait for the worker to exit and restart it with exponential backoff"""
+        while True:
+            returncode = await worker.process.wait()
+            if self.stopping:
+                return
+
+            ran_for = time.monotonic() - worker.started_at
+            worker.backoff = 1.0 if ran_for >= STABLE_AFTER else min(worker.backoff * 2, SHARD_RESTART_BACKOFF_MAX)
+            logger.warning(f"Worker {worker.index} exited with code {returncode} after {ran_for:.0f}s; "
+                           f"restarting in {worker.backoff:.0f}s")
+            await asyncio.sleep(worker.backoff)
+            if self.stopping:
+                return
+            worker.restarts += 1
+            await worker.start()
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(SHARD_HEALTH_INTERVAL)
+            await asyncio.gather(*(self._check(worker) for worker in self.workers))
+            try:
+                self.write_status()
+            except Exception as e:
+                logger.error(f"Error writing shard status to {self.status_path}: {e}")
+
+    async def _check(self, worker: Worker):
+        """Probe the worker's metrics endpoint, which only answers if its event loop is responsive"""
+        if not worker.alive() or not worker.metrics_port or worker.metrics_port == "0":
+            return
+        # Give a fresh worker time to connect before judging it
+        if time.monotonic() - worker.started_at < SHARD_HEALTH_INTERVAL * SHARD_HEALTH_FAILURES:
+            return
+
+        health = await fetch_health(METRICS_HOST, int(worker.metrics_port))
+        if health is not None:
+            worker.health_failures = 0
+            worker.last_health = health
+            return
+
+        worker.health_failures += 1
+        logger.warning(f"Worker {worker.index} missed health check {worker.health_failures}/{SHARD_HEALTH_FAILURES}")
+        if worker.health_failures >= SHARD_HEALTH_FAILURES:
+            logger.error(f"Worker {worker.index} is unresponsive, restarting it")
+            # _watch sees the exit and restarts it
+            await worker.stop()
+
+    def status(self) -> dict:
+        return {
+            "timestamp": time.time(),
+            "shard_count": self.shard_count,
+            "workers": [worker.status() for worker in self.workers]
+        }
+
+    def write_status(self):
+        """Write the worker status report as JSON, atomically replacing the file"""
+        if not self.status_path:
+            return
+        temp_path = f"{self.status_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.status(), f, indent=2)
+        os.replace(temp_path, self.status_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bot as several shard worker processes")
+    parser.add_argument("--shards", type=int, default=SHARD_COUNT, help="total shard count (default: Discord's recommendation)")
+    parser.add_argument("--processes", type=int, default=SHARD_PROCESSES, help="worker processes (default: one per CPU core)")
+    parser.add_argument("--snapshot", default=CATALOG_SNAPSHOT_PATH or DEFAULT_SNAPSHOT_PATH, help="catalog snapshot file for the workers")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not DISCORD_TOKEN:
+        logger.error("DISCORD_TOKEN not found in environment variables!")
+        sys.exit(1)
+
+    shard_count = args.shards
+    max_concurrency = 1
+    try:
+        gateway = fetch_gateway_info(DISCORD_TOKEN)
+        shard_count = shard_count or gateway["shards"]
+        max_concurrency = gateway["max_concurrency"]
+    except Exception as e:
+        if not shard_count:
+            logger.error(f"Could not get the recommended shard count from Discord, pass --shards: {e}")
+            sys.exit(1)
+        logger.warning(f"Could not read the gateway session limits, assuming max_concurrency 1: {e}")
+
+    processes = args.processes or os.cpu_count() or 1
+    supervisor = Supervisor(shard_count, processes, max_concurrency, args.snapshot)
+    if not supervisor.prepare():
+        logger.error("Database is unreachable; not starting workers")
+        sys.exit(1)
+
+    logger.info(f"Running {shard_count} shards on {len(supervisor.workers)} worker processes")
+    asyncio.run(supervisor.run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,635 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from catalog import catalog
+from config import SQLITE_PATH, SEARCH_RESULT_LIMIT
+from metrics import metrics
+from search import MAX_QUERY_LENGTH
+from stats import CARD_STAT_FIELDS, TOTAL_STAT_FIELDS
+from storage import Storage, record_query, apply_spin, plan_spin_entries, compact_collection_entry, MAX_STAR
+
+logger = logging.getLogger(__name__)
+
+# Stat columns of the version 1 collection table, converted by _compact_collection
+LEGACY_ENTRY_COLUMNS = {
+    "Mental": "mental",
+    "Physical": "physical",
+    "Social": "social",
+    "Resolve": "resolve",
+    "Initiative": "initiative",
+    "Support_Bonus": "support_bonus",
+    "Tags": "tags",
+    "Star": "star"
+}
+
+STUDENT_COLUMNS = "id, name, ppt, black_token, ftps, collection_count"
+
+UPSERT_ENTRY = (
+    "INSERT INTO collection (user_id, character_name, card_id, star, overrides) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (user_id, character_name) DO UPDATE SET "
+    "card_id = excluded.card_id, star = excluded.star, overrides = excluded.overrides"
+)
+
+def _student_document(row) -> dict:
+    return {
+        "_id": row["id"],
+        "name": row["name"],
+        "ppt": row["ppt"],
+        "black_token": row["black_token"],
+        "ftps": row["ftps"],
+        "collection_count": row["collection_count"]
+    }
+
+def _entry_document(row) -> dict:
+    entry = {"id": row["card_id"], "Star": row["star"]}
+    if row["overrides"]:
+        entry["overrides"] = json.loads(row["overrides"])
+    return entry
+
+def _entry_params(user_id: int, character_name: str, entry: dict) -> tuple:
+    overrides = json.dumps(entry["overrides"]) if entry.get("overrides") else None
+    return (user_id, character_name, entry.get("id"), entry["Star"], overrides)
+
+def _compact_collection(connection):
+    """Replace the copied stat columns of the collection table with card_id/star/overrides.
+
+    Runs inside the migration's transaction.
+    """
+    cards = {
+        row["character_name"]: json.loads(row["data"])
+        for row in connection.execute("SELECT character_name, data FROM cards")
+    }
+    connection.execute("""
+        CREATE TABLE collection_compact (
+            user_id INTEGER NOT NULL REFERENCES students(id),
+            character_name TEXT NOT NULL,
+            card_id INTEGER,
+            star INTEGER NOT NULL,
+            overrides TEXT,
+            PRIMARY KEY (user_id, character_name)
+        ) WITHOUT ROWID
+    """)
+    rows = []
+    for row in connection.execute("SELECT * FROM collection"):
+        legacy = {field: row[column] for field, column in LEGACY_ENTRY_COLUMNS.items()}
+        entry = compact_collection_entry(legacy, cards.get(row["character_name"]))
+        rows.append(_entry_params(row["user_id"], row["character_name"], entry))
+    connection.executemany(
+        "INSERT INTO collection_compact (user_id, character_name, card_id, star, overrides) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+    connection.execute("DROP TABLE collection")
+    connection.execute("ALTER TABLE collection_compact RENAME TO collection")
+    logger.info(f"Compacted {len(rows)} collection entries")
+
+# Schema changes as (version, script or function of the connection),
+# applied in order on connect; PRAGMA user_version records the last one applied
+SCHEMA_MIGRATIONS = [
+    (1, """
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    character_name TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    ppt INTEGER NOT NULL,
+    black_token INTEGER NOT NULL,
+    ftps INTEGER NOT NULL DEFAULT 0,
+    collection_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS collection (
+    user_id INTEGER NOT NULL REFERENCES students(id),
+    character_name TEXT NOT NULL,
+    mental INTEGER NOT NULL,
+    physical INTEGER NOT NULL,
+    social INTEGER NOT NULL,
+    resolve INTEGER NOT NULL,
+    initiative INTEGER NOT NULL,
+    support_bonus TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    star INTEGER NOT NULL,
+    PRIMARY KEY (user_id, character_name)
+) WITHOUT ROWID;
+"""),
+    (2, """
+CREATE TABLE IF NOT EXISTS card_stats (
+    character_name TEXT PRIMARY KEY,
+    owners INTEGER NOT NULL DEFAULT 0,
+    drops INTEGER NOT NULL DEFAULT 0,
+    stars INTEGER NOT NULL DEFAULT 0,
+    maxed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS stat_totals (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS students_ppt ON students (ppt DESC, id);
+CREATE INDEX IF NOT EXISTS students_ftps ON students (ftps DESC, id);
+CREATE INDEX IF NOT EXISTS students_collection_count ON students (collection_count DESC, id);
+"""),
+    (3, _compact_collection),
+    (4, """
+CREATE TABLE IF NOT EXISTS battles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    player_a INTEGER,
+    player_b INTEGER,
+    winner INTEGER NOT NULL,
+    log TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS battles_player_a ON battles (player_a, created_at DESC);
+CREATE INDEX IF NOT EXISTS battles_player_b ON battles (player_b, created_at DESC);
+""")
+]
+
+def _apply_migration(connection, version: int, script):
+    """Run one schema migration and record its version in the same transaction"""
+    try:
+        if callable(script):
+            connection.execute("BEGIN IMMEDIATE")
+            script(connection)
+            connection.execute(f"PRAGMA user_version = {version}")
+            connection.execute("COMMIT")
+        else:
+            # executescript commits any open transaction first, so the script carries its own
+            connection.executescript(f"BEGIN IMMEDIATE;\n{script}\nPRAGMA user_version = {version};\nCOMMIT;")
+    except BaseException:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class SQLiteDatabase(Storage):
+    """Embedded SQLite storage with the same behaviour as the MongoDB backend.
+
+    Uses one WAL-mode connection shared by every thread behind a lock;
+    SQLite runs one writer at a time anyway, and each call takes well under
+    a millisecond. Multi-step operations (spins, reservations) run in a
+    single ``BEGIN IMMEDIATE`` transaction, so they are atomic without the
+    retry loop the MongoDB backend needs. ``":memory:"`` keeps everything
+    in RAM for the life of the process.
+    """
+    def __init__(self, path: str = SQLITE_PATH):
+        super().__init__()
+        self.path = path
+        self.catalog = catalog
+        self._connection = None
+        self._lock = threading.RLock()
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self.connect()
+        return self._connection
+
+    def connect(self):
+        """Open the database file and create the schema if needed"""
+        with self._lock:
+            if self._connection is not None:
+                return
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA foreign_keys = ON")
+            connection.execute("PRAGMA busy_timeout = 5000")
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            for migration_version, script in SCHEMA_MIGRATIONS:
+                if migration_version <= version:
+                    continue
+                _apply_migration(connection, migration_version, script)
+            self._connection = connection
+            logger.info(f"Opened SQLite database {self.path}")
+
+            # New stat tables start empty; count them up from existing data
+            if 0 < version < 2:
+                self.reconcile_stats()
+
+    def _execute(self, name: str, sql: str, params=()):
+        """Run one statement, counting it as a query"""
+        record_query(name)
+        with self._lock, metrics.timer("sqlite", name):
+            return self.connection.execute(sql, params)
+
+    def _fetchone(self, name: str, sql: str, params=()):
+        with self._lock:
+            return self._execute(name, sql, params).fetchone()
+
+    def _fetchall(self, name: str, sql: str, params=()):
+        with self._lock:
+            return self._execute(name, sql, params).fetchall()
+
+    @contextmanager
+    def _transaction(self, write: bool = True):
+        """Hold the connection for a transaction; ``write`` takes the write lock up front"""
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def warm_up(self, migrate: bool = True, catalog_snapshot: str = None) -> bool:
+        """Open the database (creating the schema) and load the card catalog"""
+        if self.ping() is None:
+            return False
+        if catalog_snapshot:
+            try:
+                self.catalog.load_snapshot(catalog_snapshot)
+                return True
+            except Exception as e:
+                logger.error(f"Error loading catalog snapshot {catalog_snapshot}, reading SQLite instead: {e}")
+        return self.reload_catalog() is not None
+
+    def ping(self):
+        """Run a trivial query; returns the latency in ms or None"""
+        try:
+            start = time.perf_counter()
+            self._fetchone("ping", "SELECT 1")
+            return (time.perf_counter() - start) * 1000
+        except Exception as e:
+            logger.error(f"Database ping failed: {e}")
+            return None
+
+    def health(self) -> dict:
+        """Connection and catalog status for health checks"""
+        connected = self._connection is not None
+        return {
+            "connected": connected,
+            "ping_ms": self.ping() if connected else None,
+            "catalog_loaded": self.catalog.loaded,
+            "catalog_cards": len(self.catalog),
+            "user_cache": None
+        }
+
+    def close(self):
+        """Close the connection"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                logger.info("Database connection closed")
+            self._connection = None
+
+    def reload_catalog(self):
+        """Reload the in-memory card catalog from the cards table"""
+        try:
+            rows = self._fetchall("cards.select", "SELECT data FROM cards")
+            return self.catalog.load(json.loads(row["data"]) for row in rows)
+        except Exception as e:
+            logger.error(f"Error loading card catalog: {e}")
+            return None
+
+    def get_card_by_name(self, character_name: str):
+        """Get a character card by name"""
+        if self.catalog.loaded:
+            return self.catalog.get_by_name(character_name)
+        try:
+            row = self._fetchone("cards.select", "SELECT data FROM cards WHERE character_name = ?", (character_name,))
+            return json.loads(row["data"]) if row else None
+        except Exception as e:
+            logger.error(f"Error fetching card {character_name}: {e}")
+            return None
+
+    def get_cards_by_names(self, character_names) -> dict:
+        """Get several character cards at once, keyed by name"""
+        character_names = list(set(character_names))
+        if self.catalog.loaded:
+            cards = {}
+            for name in character_names:
+                card = self.catalog.get_by_name(name)
+                if card:
+                    cards[name] = card
+            return cards
+        try:
+            placeholders = ", ".join("?" for _ in character_names)
+            rows = self._fetchall(
+                "cards.select",
+                f"SELECT data FROM cards WHERE character_name IN ({placeholders})",
+                character_names
+            )
+            cards = [json.loads(row["data"]) for row in rows]
+            return {card["character_name"]: card for card in cards}
+        except Exception as e:
+            logger.error(f"Error fetching cards {character_names}: {e}")
+            return {}
+
+    def search_cards(self, search_term: str, limit: int = SEARCH_RESULT_LIMIT):
+        """Search for cards by name or tags, best match first"""
+        if self.catalog.loaded:
+            return self.catalog.search(search_term, limit)
+        try:
+            # Catalog unavailable: fall back to a literal substring match
+            pattern = f"%{_escape_like(search_term[:MAX_QUERY_LENGTH])}%"
+            rows = self._fetchall(
+                "cards.select",
+                "SELECT data FROM cards WHERE character_name LIKE ? ESCAPE '\\' LIMIT ?",
+                (pattern, limit)
+            )
+            return [json.loads(row["data"]) for row in rows]
+        except Exception as e:
+            logger.error(f"Error searching cards with term {search_term}: {e}")
+            return []
+
+    def get_cards_by_ids(self, card_ids, names=()) -> dict:
+        """Stored cards with the given ids or any of ``names``, keyed by id (bypasses the catalog)"""
+        card_ids, names = list(card_ids), list(names)
+        id_placeholders = ", ".join("?" for _ in card_ids)
+        name_placeholders = ", ".join("?" for _ in names)
+        rows = self._fetchall(
+            "cards.select",
+            f"SELECT data FROM cards WHERE id IN ({id_placeholders}) OR character_name IN ({name_placeholders})",
+            card_ids + names
+        )
+        cards = [json.loads(row["data"]) for row in rows]
+        return {card["_id"]: card for card in cards}
+
+    def upsert_cards(self, cards) -> int:
+        """Insert or replace cards by ``_id`` in one transaction"""
+        params = [(card["_id"], card["character_name"], json.dumps(card, default=str)) for card in cards]
+        if not params:
+            return 0
+        record_query("cards.upsert")
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT INTO cards (id, character_name, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET character_name = excluded.character_name, data = excluded.data",
+                params
+            )
+        return len(params)
+
+    def _read_user(self, user_id: int):
+        """The full user document; call inside a transaction for a consistent read"""
+        row = self._fetchone("students.select", f"SELECT {STUDENT_COLUMNS} FROM students WHERE id = ?", (user_id,))
+        if row is None:
+            return None
+        user = _student_document(row)
+        rows = self._fetchall("collection.select", "SELECT * FROM collection WHERE user_id = ?", (user_id,))
+        user["collection"] = {row["character_name"]: _entry_document(row) for row in rows}
+        return user
+
+    def get_user(self, user_id: int, use_cache: bool = None):
+        """Get user data by Discord ID"""
+        try:
+            with self._transaction(write=False):
+                return self._read_user(user_id)
+        except Exception as e:
+            logger.error(f"Error fetching user {user_id}: {e}")
+            return None
+
+    def get_user_profile(self, user_id: int):
+        """Get the profile fields of a user without the collection map"""
+        try:
+            row = self._fetchone("students.select", f"SELECT {STUDENT_COLUMNS} FROM students WHERE id = ?", (user_id,))
+            return _student_document(row) if row else None
+        except Exception as e:
+            logger.error(f"Error fetching profile for user {user_id}: {e}")
+            return None
+
+    def user_exists(self, user_id: int) -> bool:
+        """Check whether a user is registered"""
+        try:
+            return self._fetchone("students.select", "SELECT 1 FROM students WHERE id = ?", (user_id,)) is not None
+        except Exception as e:
+            logger.error(f"Error checking user {user_id}: {e}")
+            return False
+
+    def create_user(self, user_id: int, username: str, initial_ppt: int = 100000, initial_tokens: int = 30):
+        """Create a new user"""
+        try:
+            self._execute(
+                "students.insert",
+                "INSERT INTO students (id, name, ppt, black_token, ftps, collection_count) VALUES (?, ?, ?, ?, 0, 0)",
+                (user_id, username, initial_ppt, initial_tokens)
+            )
+            self.stat_counters.add_total(players=1, ppt=initial_ppt)
+            logger.info(f"Created new user: {username} ({user_id})")
+            return {
+                "_id": user_id,
+                "name": username,
+                "ppt": initial_ppt,
+                "black_token": initial_tokens,
+                "ftps": 0,
+                "collection": {},
+                "collection_count": 0
+            }
+        except Exception as e:
+            logger.error(f"Error creating user {user_id}: {e}")
+            return None
+
+    def update_user_ppt(self, user_id: int, amount: int):
+        """Update user's PPT (add or subtract)"""
+        try:
+            cursor = self._execute("students.update", "UPDATE students SET ppt = ppt + ? WHERE id = ?", (amount, user_id))
+            if cursor.rowcount:
+                self.stat_counters.add_total(ppt=amount)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating PPT for user {user_id}: {e}")
+            return False
+
+    def reserve_ppt(self, user_id: int, amount: int):
+        """Atomically take ``amount`` PPT if the user has at least that much"""
+        try:
+            with self._transaction():
+                cursor = self._execute(
+                    "students.update",
+                    "UPDATE students SET ppt = ppt - ? WHERE id = ? AND ppt >= ?",
+                    (amount, user_id, amount)
+                )
+                if cursor.rowcount == 0:
+                    return None
+                user = self._read_user(user_id)
+            self.stat_counters.add_total(ppt=-amount)
+            return user
+        except Exception as e:
+            logger.error(f"Error reserving {amount} PPT for user {user_id}: {e}")
+            return None
+
+    def refund_ppt(self, user_id: int, amount: int):
+        """Give back PPT taken by reserve_ppt for work that didn't happen"""
+        logger.info(f"Refunding {amount} PPT to user {user_id}")
+        return self.update_user_ppt(user_id, amount)
+
+    def _read_entries(self, user_id: int, character_names) -> dict:
+        character_names = list(character_names)
+        placeholders = ", ".join("?" for _ in character_names)
+        rows = self._fetchall(
+            "collection.select",
+            f"SELECT * FROM collection WHERE user_id = ? AND character_name IN ({placeholders})",
+            [user_id, *character_names]
+        )
+        return {row["character_name"]: _entry_document(row) for row in rows}
+
+    def _write_entries(self, user_id: int, owned: dict, entries: dict):
+        """Write the new and changed entries and bump collection_count for the new ones"""
+        changed = [
+            _entry_params(user_id, character_name, entry)
+            for character_name, entry in entries.items()
+            if owned.get(character_name) != entry
+        ]
+        if changed:
+            record_query("collection.upsert")
+            self.connection.executemany(UPSERT_ENTRY, changed)
+
+        new_cards = sum(1 for character_name in entries if character_name not in owned)
+        if new_cards:
+            self._execute(
+                "students.update",
+                "UPDATE students SET collection_count = collection_count + ? WHERE id = ?",
+                (new_cards, user_id)
+            )
+
+    def add_card_to_collection(self, user_id: int, character_data: dict):
+        """Add a card to user's collection or upgrade existing one"""
+        try:
+            character_name = character_data["character_name"]
+            with self._transaction():
+                if not self._fetchone("students.select", "SELECT 1 FROM students WHERE id = ?", (user_id,)):
+                    return False
+                owned = self._read_entries(user_id, [character_name])
+                entry = apply_spin(owned.get(character_name), character_data)
+                self._write_entries(user_id, owned, {character_name: entry})
+            self._record_spin_stats(owned, {character_name: entry}, [(character_name, character_data, entry)])
+            return True
+        except Exception as e:
+            logger.error(f"Error adding card to collection for user {user_id}: {e}")
+            return False
+
+    def batch_spin(self, user_id: int, character_names: list):
+        """Apply a batch of spins to a user's collection in one transaction.
+
+        The cost must already have been taken with ``reserve_ppt``. Returns
+        ``(user, results)`` like the MongoDB backend, or ``None`` if the
+        user is missing.
+        """
+        try:
+            cards = self.get_cards_by_names(character_names)
+            with self._transaction():
+                if not self._fetchone("students.select", "SELECT 1 FROM students WHERE id = ?", (user_id,)):
+                    return None
+                owned = self._read_entries(user_id, cards)
+                entries, results = plan_spin_entries(owned, character_names, cards)
+                self._write_entries(user_id, owned, entries)
+                user = self._read_user(user_id)
+            self._record_spin_stats(owned, entries, results)
+            return user, results
+        except Exception as e:
+            logger.error(f"Error spinning cards for user {user_id}: {e}")
+            return None
+
+    def get_user_collection(self, user_id: int):
+        """Get user's card collection"""
+        try:
+            rows = self._fetchall("collection.select", "SELECT * FROM collection WHERE user_id = ?", (user_id,))
+            return {row["character_name"]: _entry_document(row) for row in rows}
+        except Exception as e:
+            logger.error(f"Error getting collection for user {user_id}: {e}")
+            return {}
+
+    def _read_leaderboard(self, field: str, limit: int):
+        """Top students by ``field`` from its descending index"""
+        try:
+            rows = self._fetchall(
+                "students.select",
+                f"SELECT id, name, {field} AS value FROM students ORDER BY {field} DESC, id LIMIT ?",
+                (limit,)
+            )
+            return [{"_id": row["id"], "name": row["name"], "value": row["value"]} for row in rows]
+        except Exception as e:
+            logger.error(f"Error reading {field} leaderboard: {e}")
+            return None
+
+    def get_card_stats(self, character_name: str) -> dict:
+        """Ownership and drop counters for one card"""
+        try:
+            row = self._fetchone("card_stats.select", "SELECT * FROM card_stats WHERE character_name = ?", (character_name,))
+        except Exception as e:
+            logger.error(f"Error fetching stats for {character_name}: {e}")
+            row = None
+        return {field: row[field] if row else 0 for field in CARD_STAT_FIELDS}
+
+    def get_global_stats(self) -> dict:
+        """Players, PPT in circulation and total cards drawn"""
+        try:
+            totals = {row["name"]: row["value"] for row in self._fetchall("stat_totals.select", "SELECT * FROM stat_totals")}
+        except Exception as e:
+            logger.error(f"Error fetching global stats: {e}")
+            totals = {}
+        return {field: totals.get(field, 0) for field in TOTAL_STAT_FIELDS}
+
+    def _apply_stat_deltas(self, cards: dict, totals: dict):
+        """Add the deltas in one transaction"""
+        columns = ", ".join(CARD_STAT_FIELDS)
+        increments = ", ".join(f"{field} = {field} + excluded.{field}" for field in CARD_STAT_FIELDS)
+        record_query("card_stats.upsert")
+        with self._transaction() as connection:
+            connection.executemany(
+                f"INSERT INTO card_stats (character_name, {columns}) VALUES (?, {', '.join('?' for _ in CARD_STAT_FIELDS)}) "
+                f"ON CONFLICT (character_name) DO UPDATE SET {increments}",
+                [(name, *(deltas.get(field, 0) for field in CARD_STAT_FIELDS)) for name, deltas in cards.items()]
+            )
+            connection.executemany(
+                "INSERT INTO stat_totals (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                list(totals.items())
+            )
+
+    def reconcile_stats(self) -> bool:
+        """Recount owners/stars/maxed per card and players/ppt from the students.
+
+        ``drops`` and ``spins`` can't be recovered from the collections and
+        are left as counted.
+        """
+        try:
+            self.flush_stats()
+            record_query("card_stats.reconcile")
+            with self._transaction() as connection:
+                connection.execute("UPDATE card_stats SET owners = 0, stars = 0, maxed = 0")
+                connection.execute(
+                    "INSERT INTO card_stats (character_name, owners, stars, maxed) "
+                    "SELECT character_name, COUNT(*), SUM(star), SUM(star >= ?) FROM collection WHERE true GROUP BY character_name "
+                    "ON CONFLICT (character_name) DO UPDATE SET "
+                    "owners = excluded.owners, stars = excluded.stars, maxed = excluded.maxed",
+                    (MAX_STAR,)
+                )
+                connection.execute(
+                    "INSERT INTO stat_totals (name, value) SELECT 'players', COUNT(*) FROM students WHERE true "
+                    "ON CONFLICT (name) DO UPDATE SET value = excluded.value"
+                )
+                connection.execute(
+                    "INSERT INTO stat_totals (name, value) SELECT 'ppt', COALESCE(SUM(ppt), 0) FROM students WHERE true "
+                    "ON CONFLICT (name) DO UPDATE SET value = excluded.value"
+                )
+            logger.info("Reconciled stats")
+            return True
+        except Exception as e:
+            logger.error(f"Error reconciling stats: {e}")
+            return False
+
+    def record_battle(self, battle: dict) -> bool:
+        """Store a battle log from battle.battle_record"""
+        try:
+            players = list(battle.get("players", [])) + [None, None]
+            log = {field: value for field, value in battle.items() if field not in ("players", "winner")}
+            self._execute(
+                "battles.insert",
+                "INSERT INTO battles (created_at, player_a, player_b, winner, log) VALUES (?, ?, ?, ?, ?)",
+                (time.time(), players[0], players[1], battle["winner"], json.dumps(log, separators=(",", ":")))
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error recording battle: {e}")
+            return False
+
+# Time every call, like the MongoDB backend
+metrics.instrument_methods(SQLiteDatabase, "db")
@@ -0,0 +1,59 @@
+import threading
+from collections import Counter, defaultdict
+
+# Per-card counters kept in the card stats table/collection
+CARD_STAT_FIELDS = ("owners", "drops", "stars", "maxed")
+
+# Global counters: registered players, PPT held by players, cards drawn
+TOTAL_STAT_FIELDS = ("players", "ppt", "spins")
+
+# Leaderboard name -> student field; each field has a descending index
+LEADERBOARD_FIELDS = {
+    "ppt": "ppt",
+    "ftps": "ftps",
+    "cards": "collection_count"
+}
+
+class StatCounters:
+    """Pending increments to the card and global stat counters.
+
+    Hot paths only add to these in memory; ``drain`` hands the accumulated
+    deltas to the storage backend, which applies them in one batched write.
+    Increments commute, so several processes can flush into the same
+    counters without coordinating.
+    """
+    def __init__(self):
+        self._cards = defaultdict(Counter)
+        self._totals = Counter()
+        self._lock = threading.Lock()
+
+    def add_card(self, character_name: str, **deltas):
+        with self._lock:
+            self._cards[character_name].update(deltas)
+
+    def add_total(self, **deltas):
+        with self._lock:
+            self._totals.update(deltas)
+
+    def drain(self):
+        """Take every pending delta as ``(cards, totals)``, leaving the counters empty"""
+        with self._lock:
+            cards = {
+                name: {field: value for field, value in deltas.items() if value}
+                for name, deltas in self._cards.items()
+            }
+            totals = {field: value for field, value in self._totals.items() if value}
+            self._cards = defaultdict(Counter)
+            self._totals = Counter()
+        return {name: deltas for name, deltas in cards.items() if deltas}, totals
+
+    def restore(self, cards: dict, totals: dict):
+        """Put back deltas from a ``drain`` whose write failed"""
+        with self._lock:
+            for name, deltas in cards.items():
+                self._cards[name].update(deltas)
+            self._totals.update(totals)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._cards) + (1 if self._totals else 0)
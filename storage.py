@@ -0,0 +1,354 @@
+import abc
+import contextvars
+import logging
+import threading
+from collections import Counter
+from cache import TTLCache
+from config import LEADERBOARD_SIZE, LEADERBOARD_CACHE_TTL
+from stats import StatCounters, LEADERBOARD_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Collection entry stat -> card field it is derived from
+STAT_SOURCE_FIELDS = {
+    "Mental": "character_mental",
+    "Physical": "character_physical",
+    "Social": "character_social",
+    "Initiative": "character_initiative",
+    "Resolve": "character_resolve"
+}
+STAT_FIELDS = list(STAT_SOURCE_FIELDS)
+MAX_STAR = 5
+STAR_STAT_BONUS = 20
+
+# Fields needed to show a profile; everything except the collection map
+PROFILE_FIELDS = {"name": 1, "ppt": 1, "black_token": 1, "ftps": 1, "collection_count": 1}
+
+# Collection entries are compact: {"id": card id, "Star": star level} plus an
+# optional "overrides" dict of per-user stat values. Everything else is
+# derived from the catalog card with derive_card_stats.
+
+def new_collection_entry(character_data: dict) -> dict:
+    """Build a fresh collection entry for a catalog card"""
+    return {"id": character_data.get("_id"), "Star": character_data.get("character_star", 1)}
+
+def apply_spin(entry: dict, character_data: dict) -> dict:
+    """Return the collection entry after spinning ``character_data`` once"""
+    if entry is None:
+        return new_collection_entry(character_data)
+
+    entry = dict(entry)
+    current_star = entry.get("Star", 1)
+    if current_star < MAX_STAR:
+        entry["Star"] = current_star + 1
+    return entry
+
+def derive_card_stats(character_data: dict, entry: dict = None) -> dict:
+    """The stats a card shows at the entry's star level (its base star without an entry).
+
+    Every star above the card's base star adds STAR_STAT_BONUS to each
+    stat. The entry's ``overrides`` are added to numeric stats (so they
+    carry over upgrades and card rebalances) and replace text fields.
+    """
+    base_star = character_data.get("character_star", 1)
+    star = entry.get("Star", base_star) if entry else base_star
+    bonus = STAR_STAT_BONUS * max(0, star - base_star)
+
+    stats = {stat: character_data.get(field, 0) + bonus for stat, field in STAT_SOURCE_FIELDS.items()}
+    stats["Support_Bonus"] = character_data.get("character_support_bonus", "")
+    stats["Tags"] = character_data.get("character_tags", "")
+    stats["Star"] = star
+    overrides = entry.get("overrides") if entry else None
+    for field, value in (overrides or {}).items():
+        if field in STAT_SOURCE_FIELDS:
+            stats[field] += value
+        else:
+            stats[field] = value
+    return stats
+
+def is_legacy_entry(entry: dict) -> bool:
+    """Whether an entry still holds a full copy of the card's stats"""
+    return "Mental" in entry
+
+def compact_collection_entry(entry: dict, character_data: dict = None) -> dict:
+    """Convert a legacy full-copy entry to the compact format.
+
+    Differences from what derive_card_stats gives (everything, if the
+    card no longer exists) are kept as overrides, so the converted entry
+    shows exactly what the old one did and keeps doing so as it upgrades.
+    """
+    compact = {"id": character_data.get("_id") if character_data else None, "Star": entry.get("Star", 1)}
+    derived = derive_card_stats(character_data, compact) if character_data else {}
+    overrides = {}
+    for field, value in entry.items():
+        if field == "Star" or derived.get(field) == value:
+            continue
+        if field in STAT_SOURCE_FIELDS:
+            overrides[field] = value - derived.get(field, 0)
+        else:
+            overrides[field] = value
+    if overrides:
+        compact["overrides"] = overrides
+    return compact
+
+def plan_spin_entries(owned: dict, character_names: list, cards: dict):
+    """Apply a batch of spins to the ``owned`` collection in memory.
+
+    Returns ``(entries, results)``: the final entry of every card that was
+    drawn, and one ``(character_name, card_data, user_character_data)``
+    tuple per spin with the entry as it was right after that spin. Names
+    missing from ``cards`` give ``(character_name, None, None)``.
+    """
+    entries = {}
+    results = []
+    for character_name in character_names:
+        character_data = cards.get(character_name)
+        if not character_data:
+            results.append((character_name, None, None))
+            continue
+
+        current = entries.get(character_name, owned.get(character_name))
+        if current is not None and is_legacy_entry(current):
+            # Not compacted by the migration yet; upgrading the full copy would leave its stats stale
+            current = compact_collection_entry(current, character_data)
+        entries[character_name] = apply_spin(current, character_data)
+        results.append((character_name, character_data, entries[character_name]))
+    return entries, results
+
+_query_counter = contextvars.ContextVar("query_counter", default=None)
+
+class QueryCounter:
+    """Counts the database queries issued while it is active.
+
+    Use it as a context manager, or call ``start()``/``stop()`` when the
+    begin and end happen in different callbacks (e.g. command hooks).
+    Counters nest: queries are also counted by the counter that was
+    active when this one started.
+    """
+    def __init__(self):
+        self.count = 0
+        self.operations = Counter()
+        self._lock = threading.Lock()
+        self._token = None
+        self._parent = None
+
+    def record(self, operation: str):
+        with self._lock:
+            self.count += 1
+            self.operations[operation] += 1
+        if self._parent is not None:
+            self._parent.record(operation)
+
+    def start(self):
+        parent = _query_counter.get()
+        self._parent = parent if parent is not self else None
+        self._token = _query_counter.set(self)
+        return self
+
+    def stop(self):
+        if self._token is not None:
+            _query_counter.reset(self._token)
+            self._token = None
+            self._parent = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def summary(self) -> str:
+        """Human readable breakdown, e.g. ``2 queries (students.find_one x2)``"""
+        details = ", ".join(f"{op} x{n}" for op, n in self.operations.most_common())
+        noun = "query" if self.count == 1 else "queries"
+        return f"{self.count} {noun}" + (f" ({details})" if details else "")
+
+def record_query(operation: str):
+    """Report one query to the active QueryCounter, if any"""
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.record(operation)
+
+class Storage(abc.ABC):
+    """What the bot needs from a storage backend.
+
+    Every backend keeps the same document shapes: cards are dicts of
+    ``character_*`` fields, users are dicts with ``_id``, ``name``, ``ppt``,
+    ``black_token``, ``ftps``, ``collection_count`` and a ``collection``
+    map of character name to entry. Methods the bot calls report failures
+    by logging and returning ``None``/``False``/empty; the bulk card methods
+    used by the importer raise instead, so an import never half-succeeds
+    silently.
+
+    Card ownership and global stats are kept as counters: hot paths add
+    their deltas to ``stat_counters`` and ``flush_stats`` writes them in
+    one batch, while ``reconcile_stats`` periodically recomputes them from
+    the student data to correct any drift.
+    """
+    def __init__(self):
+        self.stat_counters = StatCounters()
+        self.leaderboard_cache = TTLCache(4 * len(LEADERBOARD_FIELDS), LEADERBOARD_CACHE_TTL)
+
+    # Lifecycle
+
+    @abc.abstractmethod
+    def warm_up(self, migrate: bool = True, catalog_snapshot: str = None) -> bool:
+        """Connect, migrate and load the card catalog before commands arrive"""
+
+    @abc.abstractmethod
+    def ping(self):
+        """Round-trip to the store; returns the latency in ms or None"""
+
+    @abc.abstractmethod
+    def health(self) -> dict:
+        """Status with ``connected``, ``ping_ms``, ``catalog_loaded``, ``catalog_cards`` and ``user_cache``"""
+
+    @abc.abstractmethod
+    def close(self):
+        """Release connections"""
+
+    # Cards
+
+    @abc.abstractmethod
+    def reload_catalog(self):
+        """Reload the in-memory card catalog; returns the card count or None"""
+
+    @abc.abstractmethod
+    def get_card_by_name(self, character_name: str):
+        """Get a character card by name"""
+
+    @abc.abstractmethod
+    def get_cards_by_names(self, character_names) -> dict:
+        """Get several character cards at once, keyed by name"""
+
+    @abc.abstractmethod
+    def search_cards(self, search_term: str, limit: int = None):
+        """Search for cards by name or tags, best match first"""
+
+    @abc.abstractmethod
+    def get_cards_by_ids(self, card_ids, names=()) -> dict:
+        """Stored cards with the given ids or any of ``names``, keyed by id (bypasses the catalog)"""
+
+    @abc.abstractmethod
+    def upsert_cards(self, cards) -> int:
+        """Insert or replace cards by ``_id``; returns how many were written"""
+
+    # Users
+
+    @abc.abstractmethod
+    def get_user(self, user_id: int, use_cache: bool = None):
+        """Get user data by Discord ID"""
+
+    @abc.abstractmethod
+    def get_user_profile(self, user_id: int):
+        """Get the profile fields of a user without the collection map"""
+
+    @abc.abstractmethod
+    def user_exists(self, user_id: int) -> bool:
+        """Check whether a user is registered"""
+
+    @abc.abstractmethod
+    def create_user(self, user_id: int, username: str, initial_ppt: int = 100000, initial_tokens: int = 30):
+        """Create a new user; returns the user or None"""
+
+    @abc.abstractmethod
+    def update_user_ppt(self, user_id: int, amount: int) -> bool:
+        """Update user's PPT (add or subtract)"""
+
+    @abc.abstractmethod
+    def reserve_ppt(self, user_id: int, amount: int):
+        """Atomically take ``amount`` PPT if the user has it; returns the user or None"""
+
+    def refund_ppt(self, user_id: int, amount: int):
+        """Give back PPT taken by reserve_ppt for work that didn't happen"""
+        return self.update_user_ppt(user_id, amount)
+
+    # Collections
+
+    @abc.abstractmethod
+    def add_card_to_collection(self, user_id: int, character_data: dict) -> bool:
+        """Add a card to user's collection or upgrade existing one"""
+
+    @abc.abstractmethod
+    def batch_spin(self, user_id: int, character_names: list):
+        """Atomically apply a batch of spins; returns ``(user, results)`` or None"""
+
+    def get_user_collection(self, user_id: int) -> dict:
+        """Get user's card collection"""
+        user = self.get_user(user_id)
+        return user.get("collection", {}) if user else {}
+
+    def cache_stats(self):
+        """Hit/miss counters of the user cache, or None if the backend has none"""
+        return None
+
+    # Leaderboards and stats
+
+    def get_leaderboard(self, board: str, limit: int = LEADERBOARD_SIZE) -> list:
+        """Top players of a board in LEADERBOARD_FIELDS as ``{"_id", "name", "value"}`` dicts.
+
+        Each board is read from a descending index, so this costs ``limit``
+        index entries however many students there are; results are also
+        cached for LEADERBOARD_CACHE_TTL seconds.
+        """
+        key = (board, limit)
+        rows = self.leaderboard_cache.get(key)
+        if rows is None:
+            rows = self._read_leaderboard(LEADERBOARD_FIELDS[board], limit)
+            if rows is not None:
+                self.leaderboard_cache.set(key, rows)
+        return rows or []
+
+    @abc.abstractmethod
+    def _read_leaderboard(self, field: str, limit: int):
+        """Top ``limit`` students by ``field``, or None on error"""
+
+    @abc.abstractmethod
+    def get_card_stats(self, character_name: str) -> dict:
+        """Counters for one card (every CARD_STAT_FIELDS key, zero if never drawn)"""
+
+    @abc.abstractmethod
+    def get_global_stats(self) -> dict:
+        """Global counters (every TOTAL_STAT_FIELDS key)"""
+
+    @abc.abstractmethod
+    def _apply_stat_deltas(self, cards: dict, totals: dict):
+        """Add drained StatCounters deltas to the stored counters; raises on failure"""
+
+    @abc.abstractmethod
+    def reconcile_stats(self) -> bool:
+        """Recompute owners/stars/maxed and players/ppt from the student data"""
+
+    @abc.abstractmethod
+    def record_battle(self, battle: dict) -> bool:
+        """Append a battle log (see battle.battle_record)"""
+
+    def flush_stats(self) -> bool:
+        """Write the pending stat deltas; on failure they are kept for the next flush"""
+        cards, totals = self.stat_counters.drain()
+        if not cards and not totals:
+            return True
+        try:
+            self._apply_stat_deltas(cards, totals)
+            return True
+        except Exception as e:
+            logger.error(f"Error flushing stats: {e}")
+            self.stat_counters.restore(cards, totals)
+            return False
+
+    def _record_spin_stats(self, owned: dict, entries: dict, results: list):
+        """Count the draws in ``results`` and how they changed ``owned`` into ``entries``"""
+        drops = Counter(character_name for character_name, card, _ in results if card)
+        for character_name, entry in entries.items():
+            before = owned.get(character_name)
+            star_before = before.get("Star", 1) if before else 0
+            star_after = entry.get("Star", 1)
+            self.stat_counters.add_card(
+                character_name,
+                owners=0 if before else 1,
+                drops=drops[character_name],
+                stars=star_after - star_before,
+                maxed=1 if star_after >= MAX_STAR > star_before else 0
+            )
+        self.stat_counters.add_total(spins=sum(drops.values()))
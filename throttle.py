@@ -0,0 +1,91 @@
+import time
+from config import COMMAND_BUDGETS, DEFAULT_COMMAND_BUDGET, GUILD_COMMAND_BUDGET, THROTTLE_MAX_BUCKETS
+
+class TokenBucket:
+    """Allows ``rate`` actions per ``per`` seconds, refilling continuously"""
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        """Seconds until the next token is available"""
+        self._refill(time.monotonic())
+        return max(0.0, (1 - self.tokens) * self.per / self.rate)
+
+    def full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.rate
+
+class CommandThrottle:
+    """Per-user and per-guild command budgets.
+
+    Every user has a bucket per command, sized from ``COMMAND_BUDGETS``,
+    and every guild has one shared bucket for all commands, so neither a
+    single user nor a single busy guild can take more than its share of
+    the database. Only the event loop touches the buckets, so no locking.
+    """
+    def __init__(self, budgets: dict = COMMAND_BUDGETS, default_budget: tuple = DEFAULT_COMMAND_BUDGET,
+                 guild_budget: tuple = GUILD_COMMAND_BUDGET, max_buckets: int = THROTTLE_MAX_BUCKETS):
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.guild_budget = guild_budget
+        self.max_buckets = max_buckets
+        self.throttled = 0
+        self._buckets = {}
+
+    def budget(self, command: str) -> tuple:
+        """The ``(rate, per)`` budget of one user for ``command``; rate 0 means unlimited"""
+        return self.budgets.get(command, self.default_budget)
+
+    def _bucket(self, key, budget: tuple) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._prune()
+            bucket = self._buckets[key] = TokenBucket(*budget)
+        return bucket
+
+    def _prune(self):
+        """Drop buckets that have refilled completely; they're equivalent to new ones"""
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if not bucket.full()}
+
+    def hit(self, command: str, user_id: int, guild_id: int = None) -> tuple:
+        """Spend one use of ``command``.
+
+        Returns ``(0.0, None)``, or if over budget the seconds to wait and
+        the scope that limited the call: ``"user"`` or ``"guild"``.
+        """
+        buckets = []
+        budget = self.budget(command)
+        if budget[0]:
+            buckets.append(("user", self._bucket(("user", user_id, command), budget)))
+        if guild_id is not None and self.guild_budget[0]:
+            buckets.append(("guild", self._bucket(("guild", guild_id), self.guild_budget)))
+
+        # Only spend tokens when every bucket has one, so a rejected call costs nothing
+        retry_after, scope = max(((bucket.wait_time(), scope) for scope, bucket in buckets), default=(0.0, None))
+        if retry_after > 0:
+            self.throttled += 1
+            return retry_after, scope
+        for _, bucket in buckets:
+            bucket.try_take()
+        return 0.0, None
+
+    def stats(self) -> dict:
+        return {"buckets": len(self._buckets), "throttled": self.throttled}
+
+# Global throttle
+throttle = CommandThrottle()
@@ -1,25 +1,22 @@
 import discord
-import asyncio
 from discord.ext import commands
-from config import RARE_CHARACTERS, UNCOMMON_CHARACTERS, COMMON_CHARACTERS, EMOJIS
+from catalog import catalog
+from collections import OrderedDict
+from config import PAGE_CACHE_SIZE
+from scheduler import update_scheduler, interaction_bucket
+from metrics import metrics
+from storage import derive_card_stats
 import logging
 
 logger = logging.getLogger(__name__)
 
 def get_character_rarity(character_name: str) -> str:
     """Determine the rarity of a character"""
-    if character_name in RARE_CHARACTERS:
-        return "rare"
-    elif character_name in UNCOMMON_CHARACTERS:
-        return "uncommon"
-    elif character_name in COMMON_CHARACTERS:
-        return "common"
-    return "common"
+    return catalog.get_rarity(character_name)
 
 def get_rarity_emoji(character_name: str) -> str:
     """Get the emoji for a character's rarity"""
-    rarity = get_character_rarity(character_name)
-    return EMOJIS.get(rarity, "")
+    return catalog.get_rarity_emoji(character_name)
 
 def create_character_embed(user: discord.User, character_data: dict, user_character_data: dict = None) -> discord.Embed:
     """Create a Discord embed for a character card"""
@@ -29,25 +26,16 @@ def create_character_embed(user: discord.User, character_data: dict, user_charac
         moves = character_data["character_moves"]
         url = character_data["character_url_image"]
         
-        # Use user's collection data if available, otherwise use base data
-        if user_character_data:
-            resolve = user_character_data["Resolve"]
-            mental = user_character_data["Mental"]
-            physical = user_character_data["Physical"]
-            social = user_character_data["Social"]
-            initiative = user_character_data["Initiative"]
-            support_bonus = user_character_data["Support_Bonus"]
-            tags = user_character_data.get("Tags", "")
-            card_star = user_character_data["Star"]
-        else:
-            resolve = character_data.get("character_resolve", 0)
-            mental = character_data.get("character_mental", 0)
-            physical = character_data.get("character_physical", 0)
-            social = character_data.get("character_social", 0)
-            initiative = character_data.get("character_initiative", 0)
-            support_bonus = character_data.get("character_support_bonus", "")
-            tags = character_data.get("character_tags", "")
-            card_star = character_data.get("character_star", 1)
+        # Stats at the user's star level if they own the card, otherwise the base card
+        stats = derive_card_stats(character_data, user_character_data)
+        resolve = stats["Resolve"]
+        mental = stats["Mental"]
+        physical = stats["Physical"]
+        social = stats["Social"]
+        initiative = stats["Initiative"]
+        support_bonus = stats["Support_Bonus"]
+        tags = stats["Tags"]
+        card_star = stats["Star"]
 
         # Create star display and rank emoji
         star_display = "⭐" * card_star
@@ -112,46 +100,81 @@ def format_number(num: int) -> str:
     return f"{num:,}"
 
 class PaginationView(discord.ui.View):
-    """Modern pagination view using buttons instead of reactions"""
-    def __init__(self, embeds: list, timeout: int = 180):
+    """Modern pagination view using buttons instead of reactions.
+
+    Pass either a list of ready-made ``embeds``, or a ``page_count`` and a
+    ``page_factory`` that builds the embed for a page index. Lazy pages are
+    only built when first shown and the most recent ones are kept in a
+    small LRU cache.
+    """
+    def __init__(self, embeds: list = None, timeout: int = 180, page_count: int = None,
+                 page_factory=None, cache_size: int = PAGE_CACHE_SIZE):
         super().__init__(timeout=timeout)
+        if embeds is None and page_factory is None:
+            raise ValueError("PaginationView needs either embeds or a page_factory")
+        
         self.embeds = embeds
+        self.page_factory = page_factory
+        self.cache_size = cache_size
+        self.page_cache = OrderedDict()
         self.current_page = 0
-        self.total_pages = len(embeds)
+        self.total_pages = len(embeds) if embeds is not None else page_count
         
         # Disable buttons if only one page
         if self.total_pages <= 1:
             self.previous_button.disabled = True
             self.next_button.disabled = True
     
+    def get_page(self, page: int) -> discord.Embed:
+        """Get the embed for a page, building it on first use"""
+        if self.embeds is not None:
+            return self.embeds[page]
+        
+        embed = self.page_cache.get(page)
+        if embed is None:
+            embed = self.page_factory(page)
+            self.page_cache[page] = embed
+            if len(self.page_cache) > self.cache_size:
+                self.page_cache.popitem(last=False)
+        else:
+            self.page_cache.move_to_end(page)
+        return embed
+    
     def update_buttons(self):
         """Update button states based on current page"""
         self.previous_button.disabled = (self.current_page == 0)
         self.next_button.disabled = (self.current_page == self.total_pages - 1)
     
+    async def show_current_page(self, interaction: discord.Interaction):
+        """Acknowledge the click and queue the page edit.
+
+        Rapid clicks are merged by the update scheduler, so only the page
+        the user ends up on is rendered and sent.
+        """
+        await interaction.response.defer()
+        update_scheduler.submit(
+            ("message", interaction.message.id),
+            lambda: interaction.edit_original_response(
+                embed=self.get_page(self.current_page),
+                content=f"Page {self.current_page + 1}/{self.total_pages}",
+                view=self
+            ),
+            bucket=interaction_bucket(interaction)
+        )
+    
     @discord.ui.button(label="◀️ Previous", style=discord.ButtonStyle.gray)
     async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if self.current_page > 0:
             self.current_page -= 1
             self.update_buttons()
-            
-            await interaction.response.edit_message(
-                embed=self.embeds[self.current_page],
-                content=f"Page {self.current_page + 1}/{self.total_pages}",
-                view=self
-            )
+            await self.show_current_page(interaction)
     
     @discord.ui.button(label="Next ▶️", style=discord.ButtonStyle.gray)
     async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if self.current_page < self.total_pages - 1:
             self.current_page += 1
             self.update_buttons()
-            
-            await interaction.response.edit_message(
-                embed=self.embeds[self.current_page],
-                content=f"Page {self.current_page + 1}/{self.total_pages}",
-                view=self
-            )
+            await self.show_current_page(interaction)
 
 async def send_paginated_embeds(ctx, embeds: list, timeout: int = 180):
     """Send paginated embeds with button controls"""
@@ -174,6 +197,27 @@ async def send_paginated_embeds(ctx, embeds: list, timeout: int = 180):
         view=view
     )
 
+async def send_lazy_paginated_embeds(ctx, page_count: int, page_factory, timeout: int = 180):
+    """Send paginated embeds that are built on demand by ``page_factory(page)``"""
+    if page_count < 1:
+        await ctx.send("No results found.")
+        return
+    
+    if page_count == 1:
+        # Single embed, no pagination needed
+        await ctx.send(embed=page_factory(0))
+        return
+    
+    # Multiple pages, only the first one is built now
+    view = PaginationView(timeout=timeout, page_count=page_count, page_factory=page_factory)
+    view.update_buttons()
+    
+    await ctx.send(
+        embed=view.get_page(0),
+        content=f"Page 1/{page_count}",
+        view=view
+    )
+
 class ConfirmView(discord.ui.View):
     """Simple confirm/cancel view"""
     def __init__(self, timeout: int = 60):
@@ -195,11 +239,20 @@ class ConfirmView(discord.ui.View):
 async def handle_error(ctx, error: Exception, command_name: str = "command"):
     """Standard error handling for commands"""
     logger.error(f"Error in {command_name}: {error}")
+    if hasattr(ctx, "started_at"):
+        # The command ran, so its call is timed by the after_invoke hook
+        metrics.record_error("command", command_name)
+    else:
+        # Rejected before invoke (bad arguments, permissions, cooldowns): there is no
+        # timed call to attach an error to, so count these with their own counter
+        metrics.increment("rejected", command_name)
     
     if isinstance(error, commands.MissingRequiredArgument):
         await ctx.send(f"❌ Missing required argument. Please check the command usage.")
     elif isinstance(error, commands.BadArgument):
         await ctx.send(f"❌ Invalid argument provided. Please check your input.")
+    elif isinstance(error, commands.MissingPermissions):
+        await ctx.send(f"❌ You don't have permission to use this command.")
     elif isinstance(error, commands.CommandOnCooldown):
         retry_after = getattr(error, 'retry_after', 0)
         await ctx.send(f"⏰ Command is on cooldown. Try again in {retry_after:.1f} seconds.")